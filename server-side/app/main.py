@@ -7,7 +7,7 @@ from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 
 from src import root_router
-from src.database import engine, SessionLocal
+from src.database import engine, SessionLocal, add_missing_columns
 from src.models import Base, Threshold
 from src.settings import HOST, PORT
 
@@ -15,6 +15,7 @@ from src.settings import HOST, PORT
 async def lifespan(app: FastAPI):
     # This will create database tables
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(bind=engine)
     init_db()
     yield
 
@@ -6,7 +6,8 @@ from fastapi import APIRouter, Depends, Form
 from typing_extensions import Annotated
 
 from ..dependencies import get_db, get_current_user
-from ..schemas import CarCrashThresholdRead, CarCrashThresholdUpdate, RecipientRead
+from ..models.enums import AccidentType
+from ..schemas import CarCrashThresholdRead, CarCrashThresholdUpdate, ThresholdRead, RecipientRead
 from ..services import SettingsService
 
 
@@ -27,6 +28,14 @@ class SettingsController:
         def update_threshold(current_user: Annotated[str, Depends(get_current_user)], threshold: float = Form(), db: Session = Depends(get_db)):
             return self.settings_service.update_threshold(db=db, new_thr=threshold)
 
+        @router.get("/thresholds", response_model=ThresholdRead)
+        def get_thresholds(db: Session = Depends(get_db)):
+            return self.settings_service.get_threshold(db=db)
+
+        @router.put("/threshold/{accident_type}", response_model=ThresholdRead)
+        def update_threshold_for_type(current_user: Annotated[str, Depends(get_current_user)], accident_type: AccidentType, threshold: float = Form(), db: Session = Depends(get_db)):
+            return self.settings_service.update_threshold(db=db, new_thr=threshold, accident_type=accident_type)
+
         @router.get("/recipient", response_model=List[RecipientRead])
         def get_recipients(current_user: Annotated[str, Depends(get_current_user)], db: Session = Depends(get_db)):
             return self.settings_service.get_recipients(db=db)
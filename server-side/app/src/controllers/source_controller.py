@@ -8,7 +8,7 @@ from ..dependencies import get_db, get_current_user
 from ..schemas import SourceRead, SourceCreate, SourceReadDetailed
 from ..services import SourceService
 
-from ..models.enums import SourceType
+from ..models.enums import SourceType, AdmissionPolicy, StreamProtocol
 
 
 class SourceController:
@@ -23,14 +23,23 @@ class SourceController:
         @router.post("/", response_model=SourceRead)
         def upload_source(current_user: Annotated[str, Depends(get_current_user)], title: str = Form(), description: str = Form(), video_file: UploadFile = File(None),
                           source_type: SourceType = Form(), stream_url: Optional[str] = Form(None),
+                          inference_stride: int = Form(1), inference_fps: Optional[float] = Form(None),
+                          motion_threshold: Optional[float] = Form(None),
+                          admission_policy: Optional[AdmissionPolicy] = Form(None),
                           db: Session = Depends(get_db)):
-            source_create = SourceCreate(title=title, description=description, source_type=source_type)
+            source_create = SourceCreate(title=title, description=description, source_type=source_type,
+                                         inference_stride=inference_stride, inference_fps=inference_fps,
+                                         motion_threshold=motion_threshold, admission_policy=admission_policy)
             return self.source_service.upload_source(db, source_create, video_file, stream_url)
 
         @router.get("/source/stream")
         def get_live_sources(db: Session = Depends(get_db)):
             return self.source_service.get_live_sources(db)
 
+        @router.get("/stats")
+        def get_pipeline_stats():
+            return self.source_service.get_pipeline_stats()
+
         @router.get("/source/{source_id}")
         def get_source(source_id: int, db: Session = Depends(get_db)):
             return self.source_service.get_source_by_id(db, source_id)
@@ -53,7 +62,7 @@ class SourceController:
             return await self.source_service.start_inference_task(db, source_id)
 
         @router.websocket("/source/stream/{source_id}")
-        async def stream_source(source_id: int, websocket: WebSocket):
+        async def stream_source(source_id: int, websocket: WebSocket, protocol: StreamProtocol = StreamProtocol.JSON):
             print(f'socket connecting, source is {source_id}')
-            await self.source_service.accept_connection(source_id, websocket)
+            await self.source_service.accept_connection(source_id, websocket, protocol)
 
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
 from .settings import DB_URI
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -6,3 +7,26 @@ from sqlalchemy.orm import declarative_base, sessionmaker
 engine = create_engine(DB_URI)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+def add_missing_columns(bind: Engine) -> None:
+    """
+    create_all only creates missing tables, columns added to the models since a table was created are added here.
+    Existing rows get the column's default, if it is a scalar one.
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    quote = bind.dialect.identifier_preparer.quote
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                print(f'DATABASE, adding column {table.name}.{column.name}')
+                connection.execute(text(f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} '
+                                        f'{column.type.compile(dialect=bind.dialect)}'))
+                if column.default is not None and column.default.is_scalar:
+                    connection.execute(table.update().values({column.name: column.default.arg}))
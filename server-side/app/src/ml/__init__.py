@@ -1 +1,6 @@
 from .worker_ml_inference import WorkerMLInference
+from .worker_ml_inference_pool import WorkerMLInferencePool
+from .session_factory import SessionConfig, create_session
+from .model_registry import ModelVariant, MODEL_VARIANTS, get_model_variant
+from .cascade_head import CascadeHead
+from .bound_session import BoundSession
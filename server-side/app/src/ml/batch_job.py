@@ -0,0 +1,25 @@
+from typing import NamedTuple, List, Dict, Any, Optional
+
+import numpy as np
+
+
+class BatchJob(NamedTuple):
+    """
+    A batch of clips passed between the stages of WorkerMLInference's pipeline.
+    """
+    source_ids: List[int]
+    # Sources run through the models, the rest repeat their last features and scores
+    infer_ids: List[int]
+    static_ids: List[int]
+    num_new_tiles: Dict[int, int]
+    # Float32 tiles of infer_ids with new tiles, in source order. None if there are none.
+    input_tensor: Optional[np.ndarray]
+    # Preview frames to stream for each source, they share the clip's scores
+    clips: Dict[int, List[Any]]
+    clip_timestamps: Dict[int, List[float]]
+    # Sources with connected viewers, only their frames are JPEG encoded
+    encode_ids: List[int]
+    # Sources whose end of stream is reached with this batch
+    ended_ids: List[int]
+    # source_id -> accident type -> scores
+    scores: Optional[Dict[int, Dict[str, np.ndarray]]] = None
@@ -0,0 +1,38 @@
+import numpy as np
+import onnxruntime as ort
+
+
+class BoundSession:
+    """
+    Runs a single input, single output ONNX session through IO binding. The float32 input is bound in place
+    and the output is written into a buffer reused between runs, so neither is allocated per batch.
+    The returned output is a view of that buffer and is only valid until the next run.
+    Not thread safe, a session is run by a single thread.
+    """
+
+    def __init__(self, session: ort.InferenceSession, max_batch_size: int) -> None:
+        self.session = session
+        self.__binding = session.io_binding()
+        self.__input_name = session.get_inputs()[0].name
+        self.__output_name = session.get_outputs()[0].name
+        output_shape = session.get_outputs()[0].shape[1:]
+        # Outputs with dynamic dimensions other than the batch are allocated by onnxruntime instead
+        self.__output_shape = tuple(output_shape) if all(isinstance(d, int) for d in output_shape) else None
+        self.__max_batch_size = max_batch_size
+        self.__output_buffer = None
+
+    def run(self, inputs: np.ndarray) -> np.ndarray:
+        inputs = np.ascontiguousarray(inputs, dtype=np.float32)
+        self.__binding.bind_input(self.__input_name, 'cpu', 0, np.float32, inputs.shape, inputs.ctypes.data)
+        if self.__output_shape is None:
+            self.__binding.bind_output(self.__output_name, 'cpu')
+            self.session.run_with_iobinding(self.__binding)
+            return self.__binding.copy_outputs_to_cpu()[0]
+
+        if self.__output_buffer is None or len(self.__output_buffer) < len(inputs):
+            self.__output_buffer = np.empty((max(self.__max_batch_size, len(inputs)), *self.__output_shape),
+                                            dtype=np.float32)
+        outputs = self.__output_buffer[:len(inputs)]
+        self.__binding.bind_output(self.__output_name, 'cpu', 0, np.float32, outputs.shape, outputs.ctypes.data)
+        self.session.run_with_iobinding(self.__binding)
+        return outputs
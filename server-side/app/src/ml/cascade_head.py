@@ -0,0 +1,25 @@
+import numpy as np
+
+
+class CascadeHead:
+    """
+    Logistic regression on the temporally mean pooled features of a clip, scoring the accident probability.
+    It is cheap compared to the transformer, so it is used to screen out obvious non-accident clips.
+    Parameters are loaded from an .npz file with 'weights' of shape (feature_dim,) and a scalar 'bias'.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float) -> None:
+        self.weights = weights.astype(np.float32)
+        self.bias = np.float32(bias)
+
+    @classmethod
+    def load(cls, path: str) -> 'CascadeHead':
+        with np.load(path) as params:
+            return cls(weights=params['weights'], bias=float(params['bias']))
+
+    def predict(self, windows: np.ndarray) -> np.ndarray:
+        """
+        windows: (num_clips, num_frames, feature_dim), returns (num_clips,) accident probabilities.
+        """
+        logits = windows.mean(axis=1) @ self.weights + self.bias
+        return 1 / (1 + np.exp(-logits))
@@ -0,0 +1,43 @@
+import time
+from typing import Dict, List, Optional
+
+
+class DynamicBatcher:
+    """
+    Groups complete clips of different sources into inference batches.
+    A batch is released once max_batch_size clips are ready, or once the oldest ready clip has waited
+    max_wait seconds, so a slow or stalled source never holds back the others.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # source_id -> time.monotonic() at which its clip became ready, in insertion (i.e. readiness) order
+        self.__ready: Dict[int, float] = {}
+
+    def mark_ready(self, source_id: int) -> None:
+        if source_id not in self.__ready:
+            self.__ready[source_id] = time.monotonic()
+
+    def discard(self, source_id: int) -> None:
+        self.__ready.pop(source_id, None)
+
+    def time_left(self) -> Optional[float]:
+        """
+        Seconds until the oldest ready clip must be run, None if there are no ready clips.
+        """
+        if len(self.__ready) == 0:
+            return None
+        oldest = next(iter(self.__ready.values()))
+        return max(0.0, oldest + self.max_wait - time.monotonic())
+
+    def next_batch(self) -> List[int]:
+        """
+        Returns source ids whose clips should be run now (oldest first), or an empty list.
+        """
+        if len(self.__ready) < self.max_batch_size and self.time_left() != 0.0:
+            return []
+        source_ids = list(self.__ready.keys())[:self.max_batch_size]
+        for source_id in source_ids:
+            del self.__ready[source_id]
+        return source_ids
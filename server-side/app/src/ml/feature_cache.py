@@ -0,0 +1,38 @@
+import numpy as np
+
+
+class FeatureCache:
+    """
+    Ring of the latest per-frame feature extractor outputs of a single source.
+    Every feature is written twice, window_size rows apart, so the latest window is always
+    available as a contiguous view in chronological order without copying.
+    """
+
+    def __init__(self, window_size: int, feature_dim: int) -> None:
+        self.window_size = window_size
+        self.__buffer = np.zeros((2 * window_size, feature_dim), dtype=np.float32)
+        # Row at which the next feature is written
+        self.__pos = 0
+        self.size = 0
+
+    def append(self, features: np.ndarray) -> None:
+        """
+        features: (num_frames, feature_dim), in the order the frames were captured.
+        """
+        features = features[-self.window_size:]
+        rows = (self.__pos + np.arange(len(features))) % self.window_size
+        self.__buffer[rows] = features
+        self.__buffer[rows + self.window_size] = features
+        self.__pos = (self.__pos + len(features)) % self.window_size
+        self.size = min(self.window_size, self.size + len(features))
+
+    def last(self) -> np.ndarray:
+        return self.__buffer[(self.__pos - 1) % self.window_size]
+
+    def window(self) -> np.ndarray:
+        """
+        View of the latest min(size, window_size) features, oldest first.
+        """
+        if self.size < self.window_size:
+            return self.__buffer[self.__pos - self.size:self.__pos]
+        return self.__buffer[self.__pos:self.__pos + self.window_size]
@@ -0,0 +1,36 @@
+import os
+from typing import NamedTuple, Dict
+
+MODELS_DIR = 'app/src/ml/models'
+
+
+class ModelVariant(NamedTuple):
+    feature_extractor_path: str
+    transformer_path: str
+
+
+def get_variant_path(model_path: str, variant: str) -> str:
+    """
+    Variants are stored next to the original model, e.g. feature_extractor_gpu_int8_dynamic.onnx.
+    """
+    if variant == 'fp32':
+        return model_path
+    stem, ext = os.path.splitext(model_path)
+    return f'{stem}_{variant}{ext}'
+
+
+FEATURE_EXTRACTOR_PATH = os.path.join(MODELS_DIR, 'feature_extractor_gpu.onnx')
+TRANSFORMER_PATH = os.path.join(MODELS_DIR, 'transformer_gpu.onnx')
+
+# fp32 are the original models, INT8 variants are produced by app/src/scripts/quantize_models.py
+MODEL_VARIANTS: Dict[str, ModelVariant] = {
+    variant: ModelVariant(feature_extractor_path=get_variant_path(FEATURE_EXTRACTOR_PATH, variant),
+                          transformer_path=get_variant_path(TRANSFORMER_PATH, variant))
+    for variant in ('fp32', 'int8_dynamic', 'int8_static')
+}
+
+
+def get_model_variant(variant: str) -> ModelVariant:
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f'Unknown model variant {variant}, expected one of {list(MODEL_VARIANTS)}')
+    return MODEL_VARIANTS[variant]
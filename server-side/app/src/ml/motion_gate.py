@@ -0,0 +1,38 @@
+from typing import Optional
+
+import numpy as np
+
+
+class MotionGate:
+    """
+    Decides whether a clip of a single source shows a static scene, by comparing consecutive model input tiles.
+    Tiles are subsampled and averaged over channels first, so the check costs a tiny fraction of inference.
+    Exact duplicates of the previous frame are counted separately, a clip made of them only means
+    that the camera is stalled.
+    """
+
+    def __init__(self, threshold: Optional[float], subsample: int = 4) -> None:
+        # Mean absolute pixel change (0-255) of the most changing frame pair, below which the clip is static.
+        # None disables gating, duplicate frames are still counted.
+        self.threshold = threshold
+        self.__subsample = subsample
+        self.__previous: Optional[np.ndarray] = None
+        self.num_duplicates = 0
+        self.frozen = False
+
+    def is_static(self, tiles: np.ndarray) -> bool:
+        """
+        tiles: (num_frames, h, w, 3) uint8 array of a clip, in the order they were captured.
+        """
+        gray = tiles[:, ::self.__subsample, ::self.__subsample].mean(axis=3, dtype=np.float32)
+        if self.__previous is not None:
+            gray = np.concatenate((self.__previous[np.newaxis], gray))
+        self.__previous = gray[-1]
+        if len(gray) < 2:
+            return False
+
+        diffs = np.abs(np.diff(gray, axis=0)).mean(axis=(1, 2))
+        num_duplicates = int(np.count_nonzero(diffs == 0))
+        self.num_duplicates += num_duplicates
+        self.frozen = num_duplicates == len(diffs)
+        return self.threshold is not None and float(diffs.max()) < self.threshold
@@ -0,0 +1,128 @@
+import hashlib
+import os
+from typing import NamedTuple, Tuple
+
+import onnxruntime as ort
+
+
+class SessionConfig(NamedTuple):
+    # In order of preference, unavailable ones are skipped and CPU is always appended as a fallback
+    providers: Tuple[str, ...] = ('CPUExecutionProvider',)
+    # 0 lets onnxruntime decide
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    # 'sequential' or 'parallel'
+    execution_mode: str = 'sequential'
+    # 'disable', 'basic', 'extended' or 'all'
+    graph_optimization_level: str = 'all'
+    # onnxruntime intra-op thread affinities, e.g. '1,2;3,4' for 3 intra-op threads, empty keeps the default
+    thread_affinity: str = ''
+
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL,
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def get_providers(config: SessionConfig) -> Tuple[str, ...]:
+    available = ort.get_available_providers()
+    providers = [provider for provider in config.providers if provider in available]
+    if 'CPUExecutionProvider' not in providers:
+        providers.append('CPUExecutionProvider')
+    return tuple(providers)
+
+
+def validate(config: SessionConfig) -> None:
+    """
+    Raises ValueError for an invalid configuration, so it fails at startup rather than in a worker process.
+    """
+    if config.execution_mode not in EXECUTION_MODES:
+        raise ValueError(f'Unknown execution mode {config.execution_mode}, expected one of {list(EXECUTION_MODES)}')
+    if config.graph_optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f'Unknown graph optimization level {config.graph_optimization_level}, '
+                         f'expected one of {list(GRAPH_OPTIMIZATION_LEVELS)}')
+    if config.intra_op_threads < 0 or config.inter_op_threads < 0:
+        raise ValueError('Thread counts must not be negative')
+
+
+def get_session_options(config: SessionConfig) -> ort.SessionOptions:
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = config.intra_op_threads
+    options.inter_op_num_threads = config.inter_op_threads
+    options.execution_mode = EXECUTION_MODES[config.execution_mode]
+    options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[config.graph_optimization_level]
+    if config.thread_affinity:
+        options.add_session_config_entry('session.intra_op_thread_affinities', config.thread_affinity)
+    return options
+
+
+def create_session(model_path: str, config: SessionConfig, cache_dir: str = '') -> ort.InferenceSession:
+    """
+    Creates the session with the first available configured providers. If that fails (e.g. CUDA is
+    reported as available, but its libraries cannot be loaded), the session is created on CPU only.
+    cache_dir: optimized graphs are saved here and loaded instead of optimizing the model again, empty disables.
+    The effective configuration is logged.
+    """
+    providers = get_providers(config)
+    try:
+        session = _create_session(model_path, config, providers, cache_dir)
+    except Exception as e:
+        if providers == ('CPUExecutionProvider',):
+            raise
+        print(f'SESSION, {os.path.basename(model_path)}: could not create session with {providers}, '
+              f'falling back to CPU: {e}')
+        session = _create_session(model_path, config, ('CPUExecutionProvider',), cache_dir)
+    print(f'SESSION, {os.path.basename(model_path)}: providers={session.get_providers()}, '
+          f'intra_op_threads={config.intra_op_threads}, inter_op_threads={config.inter_op_threads}, '
+          f'execution_mode={config.execution_mode}, graph_optimization_level={config.graph_optimization_level}, '
+          f'thread_affinity={config.thread_affinity or "default"}, optimized_model_cache={cache_dir or "disabled"}')
+    return session
+
+
+def get_cached_model_path(model_path: str, config: SessionConfig, providers: Tuple[str, ...], cache_dir: str) -> str:
+    """
+    Optimized graphs depend on the model, the optimization level, the providers (which may fuse nodes into
+    provider specific ones) and the onnxruntime version, the cache key covers all of them.
+    """
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(repr((providers, config.graph_optimization_level, ort.__version__)).encode())
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f'{name}_{digest.hexdigest()[:16]}.onnx')
+
+
+def _create_session(model_path: str, config: SessionConfig, providers: Tuple[str, ...],
+                    cache_dir: str) -> ort.InferenceSession:
+    options = get_session_options(config)
+    if not cache_dir:
+        return ort.InferenceSession(model_path, sess_options=options, providers=list(providers))
+
+    cached_path = get_cached_model_path(model_path, config, providers, cache_dir)
+    if os.path.exists(cached_path):
+        # Already optimized, the graph must not be optimized again while loading
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        try:
+            return ort.InferenceSession(cached_path, sess_options=options, providers=list(providers))
+        except Exception as e:
+            print(f'SESSION, discarding unusable optimized model {cached_path}: {e}')
+            os.remove(cached_path)
+            options = get_session_options(config)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # Other workers may be optimizing the same model, the finished graph is moved into place atomically
+    temp_path = f'{os.path.splitext(cached_path)[0]}.{os.getpid()}.tmp.onnx'
+    options.optimized_model_filepath = temp_path
+    session = ort.InferenceSession(model_path, sess_options=options, providers=list(providers))
+    if os.path.exists(temp_path):
+        os.replace(temp_path, cached_path)
+    return session
@@ -3,41 +3,169 @@ import multiprocessing
 import queue
 import signal
 import sys
+import threading
 import time
 import traceback
 from multiprocessing import Process, current_process
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 import cv2
 import numpy as np
-import onnxruntime as ort
+
+from .batch_job import BatchJob
+from .bound_session import BoundSession
+from .cascade_head import CascadeHead
+from .dynamic_batcher import DynamicBatcher
+from .feature_cache import FeatureCache
+from .model_registry import get_model_variant
+from .motion_gate import MotionGate
+from .session_factory import SessionConfig, create_session
+from ..stream import FrameRingBuffer, FrameDescriptor, SourceCommand, SourceCommandType
+from ..utilities import SharedCounters
 
 
 class WorkerMLInference:
-    def __init__(self, on_done: callable, batch_size: int = 30, img_h: int = 128, img_w: int = 128) -> None:
+    """
+    Inference runs as a pipeline of three threads inside the worker process, connected by bounded queues:
+    preprocessing (reading frames, batching, motion gating, building the input tensor), inference
+    (both ONNX sessions) and postprocessing (JPEG encoding and dispatch of results), so that encoding
+    of one batch overlaps with inference of the next.
+    Per-stage busy time (including time blocked on a full downstream queue, which is also counted separately)
+    and queue depths are exposed in counters, stage occupancy is the busy time increase over wall time.
+    """
+    STAGES = ('preprocess', 'infer', 'postprocess')
+    # Accident type scored by the transformer, further types are scored by heads on the same features
+    PRIMARY_HEAD = 'CAR_CRASH'
+    COUNTERS = ('ml.clips_inferred', 'ml.clips_skipped_static', 'ml.clips_screened_out', 'ml.frames_duplicate',
+                *(f'ml.{stage}_busy_us' for stage in STAGES),
+                *(f'ml.{stage}_blocked_us' for stage in STAGES[:-1]),
+                'ml.infer_queue_depth', 'ml.postprocess_queue_depth',
+                'ml.dropped_oldest', 'ml.dropped_recycled')
+
+    def __init__(self, on_done: callable, batch_size: int = 30, img_h: int = 128, img_w: int = 128,
+                 max_clips_per_batch: int = 8, max_batch_wait: float = 0.05, window_stride: int = None,
+                 pipeline_depth: int = 2, preview_max_fps: float = 0,
+                 extractor_session_config: SessionConfig = SessionConfig(
+                     providers=('CUDAExecutionProvider', 'CPUExecutionProvider')),
+                 transformer_session_config: SessionConfig = SessionConfig(),
+                 model_cache_dir: str = '',
+                 model_variant: str = 'fp32',
+                 cascade_head_path: str = '', cascade_threshold: float = 0.1,
+                 heads: Dict[str, str] = None,
+                 name: str = 'PROCESS_worker_ml_inference') -> None:
+        """
+        batch_size: number of frames in a clip scored by the transformer.
+        window_stride: number of new frames after which the transformer re-scores the latest batch_size frames.
+        Features of already seen frames are cached, so only new frames go through the feature extractor.
+        Defaults to batch_size, i.e. non-overlapping clips.
+        max_clips_per_batch, max_batch_wait: clips of different sources are inferred together once this many
+        are ready, or once the oldest ready clip has waited this many seconds.
+        pipeline_depth: number of batches which can wait between two pipeline stages.
+        preview_max_fps: preview frames are JPEG encoded only for sources with connected viewers, and no more
+        often than this many times per second of capture time, 0 encodes every frame. Frames which are not
+        encoded are passed on with enc_frame None.
+        Processed frames are passed to on_done as (source_id, frame, enc_frame, scores, timestamp, success),
+        timestamp being the frame's capture time (time.time) from the reader.
+        extractor_session_config, transformer_session_config: providers and threading of the ONNX sessions.
+        model_cache_dir: directory of optimized ONNX graphs reused between starts, empty disables the cache.
+        model_variant: see model_registry, e.g. fp32 or one of the INT8 quantized variants.
+        cascade_head_path: .npz parameters of a CascadeHead, which screens clips before the transformer.
+        Only clips with a screening accident probability of at least cascade_threshold are scored by the
+        transformer, the rest get the screening scores. Empty disables the cascade.
+        heads: accident type -> ONNX model scoring further accident types from the same feature windows as the
+        transformer, i.e. (clips, batch_size, features) -> (clips, 2). Frames are decoded and features extracted
+        once for all of them. Scores are passed on as a dict of accident type -> scores, PRIMARY_HEAD's being
+        the transformer's, it cannot be configured as a head (ValueError).
+        """
         self.__queue = multiprocessing.Queue(maxsize=500)
+        # Per-source parameters, drained without blocking before each frame is handled
+        self.__commands = multiprocessing.Queue()
+        self.counters = SharedCounters(self.COUNTERS)
         self.__on_done = on_done
         self.__batch_size = batch_size
+        self.__window_stride = min(batch_size, window_stride or batch_size)
         self.__img_h = img_h
         self.__img_w = img_w
+        self.__pipeline_depth = max(1, pipeline_depth)
+        self.__preview_max_fps = preview_max_fps
+        self.__extractor_session_config = extractor_session_config
+        self.__transformer_session_config = transformer_session_config
+        self.__model_cache_dir = model_cache_dir
+        self.__cascade_head = CascadeHead.load(cascade_head_path) if cascade_head_path else None
+        self.__cascade_threshold = cascade_threshold
+        self.__head_paths = dict(heads or {})
+        if self.PRIMARY_HEAD in self.__head_paths:
+            # Its scores would silently replace the transformer's
+            raise ValueError(f'{self.PRIMARY_HEAD} is scored by the transformer and cannot be configured as a head')
+        self.__head_sessions = {}
+        # Set once the sessions are created and warmed up
+        self.ready = multiprocessing.Event()
+        self.__name = name
+        self.__infer_queue = None
+        self.__postprocess_queue = None
+
+        # Preprocessing stage state
         self.__batch_data: Dict[int, Dict[str, Any]] = {}
+        self.__batcher = DynamicBatcher(max_batch_size=max_clips_per_batch, max_wait=max_batch_wait)
+        self.__rings: Dict[int, FrameRingBuffer] = {}
+        self.__source_params: Dict[int, Dict[str, Any]] = {}
+        self.__gates: Dict[int, MotionGate] = {}
+        # Sources sent for inference at least once, i.e. with scores to reuse for static clips
+        self.__inferred_sources = set()
         self.__last_frame_hit = []
-        self.__to_delete = []
-        self.__feature_extractor_onnx_path = 'app/src/ml/models/feature_extractor_gpu.onnx'
-        self.__transformer_onnx_path = 'app/src/ml/models/transformer_gpu.onnx'
+        # Preprocessing buffers are reused between batches, sized for max_clips_per_batch whole windows.
+        # Input tensors rotate, as batches queued for the inference stage still reference theirs.
+        self.__max_clips_per_batch = max_clips_per_batch
+        self.__input_buffers = []
+        self.__next_input_buffer = 0
+
+        # Inference stage state
+        # Scores of the last inferred clip, reused for static clips
+        self.__last_scores: Dict[int, Dict[str, np.ndarray]] = {}
+        self.__feature_caches: Dict[int, FeatureCache] = {}
+        # Features of a black frame, pad windows of sources with fewer than batch_size frames
+        self.__blank_features = None
+        self.__windows_buffer = None
+
+        # Postprocessing stage state
+        # Capture timestamp of the last encoded frame of each source
+        self.__last_encoded: Dict[int, float] = {}
+
+        model_paths = get_model_variant(model_variant)
+        self.__feature_extractor_onnx_path = model_paths.feature_extractor_path
+        self.__transformer_onnx_path = model_paths.transformer_path
         self.__feature_extractor_session = None
         self.__transformer_session = None
         self.__process = None
 
     def add(self, data) -> None:
-        try:
-            self.__queue.put(data, block=True)
-        except queue.Full:
-            print(f'WorkerMLInference queue is full! Element not added.')
-            return
+        """
+        Does not block the reader on a full queue, raises queue.Full instead and the reader's FrameOutbox
+        retries the frame later. End of stream markers are always taken.
+        """
+        _, _, success = data
+        self.__queue.put(data, block=not success)
+
+    def update_source(self, source_id: int, **params) -> None:
+        """
+        motion_threshold: see MotionGate, None disables skipping of static clips.
+        viewers: number of clients watching the source, frames of sources without viewers are not encoded.
+        admission_policy, admission_quota: with DROP_OLDEST, unread frames of the source beyond admission_quota
+        are skipped, oldest first.
+        max_speed: the source is read as fast as inference keeps up, its frames are never skipped.
+        """
+        self.__commands.put(SourceCommand(type=SourceCommandType.UPDATE_PARAMS, source_id=source_id, payload=params))
+
+    def remove_source(self, source_id: int) -> None:
+        """
+        Forgets the parameters of a source, which has ended on another worker.
+        The worker a source has run on forgets them with its end of stream marker.
+        """
+        self.__commands.put(SourceCommand(type=SourceCommandType.REMOVE, source_id=source_id))
 
     def start(self) -> None:
-        self.__process = Process(target=self.__do_work, name='PROCESS_worker_ml_inference')
+        self.ready.clear()
+        self.__process = Process(target=self.__do_work, name=self.__name)
         self.__process.start()
 
     def stop(self) -> None:
@@ -50,60 +178,210 @@ class WorkerMLInference:
         # del self.__transformer_session
 
     def __do_work(self) -> None:
-        self.__feature_extractor_session = (
-            ort.InferenceSession(self.__feature_extractor_onnx_path, providers=['CUDAExecutionProvider']))
-        self.__transformer_session = (
-            ort.InferenceSession(self.__transformer_onnx_path, providers=['CPUExecutionProvider']))
+        # Sessions run through IO binding, their outputs are written into buffers reused between batches
+        self.__feature_extractor_session = BoundSession(
+            create_session(self.__feature_extractor_onnx_path, self.__extractor_session_config,
+                           self.__model_cache_dir),
+            max_batch_size=self.__max_clips_per_batch * self.__batch_size)
+        self.__transformer_session = BoundSession(
+            create_session(self.__transformer_onnx_path, self.__transformer_session_config, self.__model_cache_dir),
+            max_batch_size=self.__max_clips_per_batch)
+        self.__head_sessions = {accident_type: BoundSession(create_session(path, self.__transformer_session_config,
+                                                                           self.__model_cache_dir),
+                                                            max_batch_size=self.__max_clips_per_batch)
+                                for accident_type, path in self.__head_paths.items()}
+        self.__warm_up()
+        self.ready.set()
+        self.__infer_queue = queue.Queue(maxsize=self.__pipeline_depth)
+        self.__postprocess_queue = queue.Queue(maxsize=self.__pipeline_depth)
+        threading.Thread(target=self.__run_stage, args=('infer', self.__infer_queue, self.__infer_batch),
+                         name='THREAD_ml_infer', daemon=True).start()
+        threading.Thread(target=self.__run_stage, args=('postprocess', self.__postprocess_queue, self.__send_batch),
+                         name='THREAD_ml_postprocess', daemon=True).start()
+        # Preprocessing runs in the main thread of the process
         while 1:
             try:
-                source_id, frame, success = self.__queue.get(block=True)
-                if source_id not in self.__batch_data.keys():
-                    # Initialize new source
-                    self.__batch_data[source_id] = {'frames': [], 'ready': False}
-
-                if success:
-                    self.__batch_data[source_id]['frames'].append(frame)
-                else:
-                    self.__last_frame_hit.append(source_id)
-
-                self.__set_batch_ready(source_id, success)
+                # Wake up no later than the deadline of the oldest ready clip
+                source_id, descriptor, success = self.__queue.get(block=True, timeout=self.__batcher.time_left())
+                started = time.perf_counter()
+                self.__handle_commands()
+                self.__add_frame(source_id, descriptor, success)
                 self.__process_batch()
+                self.__add_busy_time('preprocess', started)
 
             except queue.Empty:
+                started = time.perf_counter()
                 self.__process_batch()
+                self.__add_busy_time('preprocess', started)
             except BaseException as e:
                 time.sleep(5)
                 e_type, e_object, e_traceback = sys.exc_info()
                 print(f'{current_process().name}\n'
                       f'Error:{e_type}:{e_object}\n{"".join(traceback.format_tb(e_traceback))}')
 
+    def __warm_up(self) -> None:
+        """
+        Runs a full batch of black frames through all models, so that the first real batch does not pay
+        for lazy allocations. Features of black frames are kept for padding short windows.
+        """
+        started = time.perf_counter()
+        blank_frames = np.zeros((self.__batch_size, self.__img_h, self.__img_w, 3), dtype=np.float32)
+        features = self.__extract_features(blank_frames)
+        self.__blank_features = features[0].copy()
+        windows = np.repeat(features[np.newaxis], self.__max_clips_per_batch, axis=0)
+        self.__transformer_session.run(windows)
+        for head_session in self.__head_sessions.values():
+            head_session.run(windows)
+        print(f'{current_process().name}, warmed up in {time.perf_counter() - started:.2f}s')
+
+    def __run_stage(self, stage: str, stage_queue: queue.Queue, handle_job: callable) -> None:
+        while 1:
+            try:
+                job = stage_queue.get(block=True)
+                self.counters.set(f'ml.{stage}_queue_depth', stage_queue.qsize())
+                started = time.perf_counter()
+                handle_job(job)
+                self.__add_busy_time(stage, started)
+            except BaseException as e:
+                e_type, e_object, e_traceback = sys.exc_info()
+                print(f'{threading.current_thread().name}\n'
+                      f'Error:{e_type}:{e_object}\n{"".join(traceback.format_tb(e_traceback))}')
+
+    def __pass_on(self, stage: str, next_queue: queue.Queue, next_stage: str, job: BatchJob) -> None:
+        """
+        Blocks while the next stage is behind, time spent blocked is accounted to the passing stage.
+        """
+        started = time.perf_counter()
+        next_queue.put(job, block=True)
+        self.counters.increment(f'ml.{stage}_blocked_us', int((time.perf_counter() - started) * 1e6))
+        self.counters.set(f'ml.{next_stage}_queue_depth', next_queue.qsize())
+
+    def __add_busy_time(self, stage: str, started: float) -> None:
+        self.counters.increment(f'ml.{stage}_busy_us', int((time.perf_counter() - started) * 1e6))
+
+    def __add_frame(self, source_id: int, descriptor: FrameDescriptor, success: bool) -> None:
+        planes = None
+        if success:
+            planes = self.__read_frame(descriptor)
+            if planes is None:
+                # Slot was recycled by the reader before we got to it
+                return
+
+        if source_id not in self.__batch_data.keys():
+            # Initialize new source
+            self.__batch_data[source_id] = {'frames': [], 'timestamps': [], 'has_tile': [], 'tiles': [],
+                                            'num_cached': 0}
+
+        if success:
+            # Preview resolution BGR frame for streaming, model resolution RGB tile for inference.
+            # Frames skipped by the source's inference stride come without a tile.
+            self.__batch_data[source_id]['frames'].append(planes['preview'])
+            self.__batch_data[source_id]['timestamps'].append(descriptor.timestamp)
+            self.__batch_data[source_id]['has_tile'].append('model' in planes)
+            if 'model' in planes:
+                self.__batch_data[source_id]['tiles'].append(planes['model'])
+        else:
+            self.__last_frame_hit.append(source_id)
+
+        self.__update_ready(source_id)
+
+    def __handle_commands(self) -> None:
+        while 1:
+            try:
+                command = self.__commands.get(block=False)
+            except queue.Empty:
+                return
+            if command.type == SourceCommandType.UPDATE_PARAMS:
+                self.__source_params.setdefault(command.source_id, {}).update(command.payload)
+                if command.source_id in self.__gates and 'motion_threshold' in command.payload:
+                    self.__gates[command.source_id].threshold = command.payload['motion_threshold']
+            elif command.type == SourceCommandType.REMOVE and command.source_id not in self.__batch_data:
+                # Kept while the source runs on this worker, e.g. if it has been started again meanwhile
+                self.__source_params.pop(command.source_id, None)
+
+    def __read_frame(self, descriptor: FrameDescriptor):
+        ring = self.__rings.get(descriptor.source_id)
+        if ring is None or ring.name != descriptor.ring_name:
+            if ring is not None:
+                ring.close()
+            try:
+                ring = self.__rings[descriptor.source_id] = FrameRingBuffer.attach(descriptor)
+            except FileNotFoundError:
+                # Reader has already released the ring
+                self.__rings.pop(descriptor.source_id, None)
+                self.counters.increment('ml.dropped_recycled')
+                return None
+        params = self.__source_params.get(descriptor.source_id, {})
+        if (params.get('admission_policy') == 'DROP_OLDEST' and not params.get('max_speed', False) and
+                ring.pending() > params.get('admission_quota', ring.num_slots)):
+            ring.skip(descriptor)
+            self.counters.increment('ml.dropped_oldest')
+            return None
+        planes = ring.read(descriptor)
+        if planes is None:
+            # Slot was already overwritten by a newer frame
+            self.counters.increment('ml.dropped_recycled')
+        return planes
+
+    def __close_ring(self, source_id: int) -> None:
+        ring = self.__rings.pop(source_id, None)
+        if ring is not None:
+            ring.close()
+
     def __process_batch(self) -> None:
-        if not self.__all_batches_ready():
+        source_ids = self.__batcher.next_batch()
+        if len(source_ids) == 0:
             return
 
-        scores = self.__infer()
-        for i in range(self.__batch_size):
-            for j, s in enumerate(self.__batch_data.keys()):
-                frames = self.__batch_data[s]['frames']
-                if len(frames) == 0 and s in self.__last_frame_hit and s not in self.__to_delete:
-                    self.__on_done((s, None, None, None, False))
-                    self.__to_delete.append(s)
-                if i >= len(frames):
-                    # All frames have been sent
-                    continue
-                frame_to_send = frames[i]
-                _, enc_frame = cv2.imencode(".jpg", frame_to_send, [int(cv2.IMWRITE_JPEG_QUALITY), 20])
-                is_final_frame = (s in self.__last_frame_hit and
-                                  (len(frames) <= self.__batch_size) and
-                                  (i + 1) == len(frames))
-                if is_final_frame:
-                    self.__to_delete.append(s)
-                self.__on_done((s, frame_to_send, enc_frame, scores[j], not is_final_frame))
-
-        for s in self.__to_delete:
-            self.__remove_finished_source(s)
-        self.__to_delete = []
-        self.__reset_batches()
+        num_new_tiles = {s: min(len(self.__batch_data[s]['tiles']), self.__get_num_tiles_needed(s))
+                         for s in source_ids}
+        infer_ids, static_ids = self.__get_sources_to_infer(source_ids, num_new_tiles)
+        extract_ids = [s for s in infer_ids if num_new_tiles[s] > 0]
+        input_tensor = self.__get_input_tensor(extract_ids, num_new_tiles) if len(extract_ids) > 0 else None
+        clips, clip_timestamps, ended_ids = {}, {}, []
+        for s in source_ids:
+            data = self.__batch_data[s]
+            num_to_send = self.__get_num_clip_frames(s, num_new_tiles[s])
+            clips[s] = data['frames'][:num_to_send]
+            clip_timestamps[s] = data['timestamps'][:num_to_send]
+            if s in self.__last_frame_hit and num_to_send == len(data['frames']):
+                ended_ids.append(s)
+
+        encode_ids = [s for s in source_ids if self.__source_params.get(s, {}).get('viewers', 0) > 0]
+        for s in source_ids:
+            if s in ended_ids:
+                self.__remove_finished_source(s)
+            else:
+                self.__reset_batch(source_id=s, num_sent=len(clips[s]), num_tiles_used=num_new_tiles[s])
+                self.__update_ready(s)
+        self.__pass_on('preprocess', self.__infer_queue, 'infer',
+                       BatchJob(source_ids=source_ids, infer_ids=infer_ids, static_ids=static_ids,
+                                num_new_tiles=num_new_tiles, input_tensor=input_tensor, clips=clips,
+                                clip_timestamps=clip_timestamps, encode_ids=encode_ids, ended_ids=ended_ids))
+
+    def __get_num_clip_frames(self, source_id: int, num_tiles: int) -> int:
+        """
+        Number of frames, up to and including the one with the last tile used in this run.
+        With an inference stride > 1 frames in between share the run's scores.
+        """
+        data = self.__batch_data[source_id]
+        if source_id in self.__last_frame_hit and num_tiles == len(data['tiles']):
+            return len(data['frames'])
+        tiles_seen = 0
+        for i, has_tile in enumerate(data['has_tile']):
+            tiles_seen += has_tile
+            if tiles_seen == num_tiles:
+                return i + 1
+        return len(data['has_tile'])
+
+    def __get_num_tiles_needed(self, source_id: int) -> int:
+        """
+        New tiles needed to score the source again: a whole window at first, window_stride afterwards.
+        """
+        num_cached = self.__batch_data[source_id]['num_cached']
+        if num_cached < self.__batch_size:
+            return self.__batch_size - num_cached
+        return self.__window_stride
 
     def print_batch_info(self):
         for source_id in self.__batch_data.keys():
@@ -111,50 +389,199 @@ class WorkerMLInference:
         print()
 
     def __remove_finished_source(self, source_id: int) -> None:
+        """
+        Preprocessing state only, the inference stage drops its own once it has scored the last clip.
+        """
         del self.__batch_data[source_id]
         self.__last_frame_hit.remove(source_id)
+        self.__close_ring(source_id)
+        self.__source_params.pop(source_id, None)
+        self.__gates.pop(source_id, None)
+        self.__inferred_sources.discard(source_id)
+        self.__batcher.discard(source_id)
+
+    def __reset_batch(self, source_id: int, num_sent: int, num_tiles_used: int) -> None:
+        data = self.__batch_data[source_id]
+        data['frames'] = data['frames'][num_sent:]
+        data['timestamps'] = data['timestamps'][num_sent:]
+        data['has_tile'] = data['has_tile'][num_sent:]
+        data['tiles'] = data['tiles'][num_tiles_used:]
+        # Mirrors the size of the source's feature cache in the inference stage
+        data['num_cached'] = min(self.__batch_size, data['num_cached'] + num_tiles_used)
+
+    def __get_sources_to_infer(self, batch_source_ids: List[int], num_new_tiles: Dict[int, int]):
+        """
+        Splits the batch into sources to infer and static sources, whose new frames show no motion
+        and which have scores to reuse. Static sources repeat their last features in the cache,
+        as the scene has not changed. Sources without new tiles are in neither, they reuse their last scores.
+        """
+        source_ids, static_ids = [], []
+        for source_id in batch_source_ids:
+            data = self.__batch_data[source_id]
+            gate = self.__gates.get(source_id)
+            if gate is None:
+                gate = self.__gates[source_id] = MotionGate(
+                    threshold=self.__source_params.get(source_id, {}).get('motion_threshold'))
+            tiles = data['tiles'][:num_new_tiles[source_id]]
+            if len(tiles) == 0:
+                # Nothing new to score (e.g. an ended source sending its last frames), its last scores are reused.
+                # Only a source without any is scored on its padded window.
+                if source_id not in self.__inferred_sources:
+                    source_ids.append(source_id)
+                continue
+            num_duplicates, was_frozen = gate.num_duplicates, gate.frozen
+            static = gate.is_static(np.stack(tiles))
+            if gate.num_duplicates > num_duplicates:
+                self.counters.increment('ml.frames_duplicate', gate.num_duplicates - num_duplicates)
+            if gate.frozen and not was_frozen:
+                print(f'WorkerMLInference, source {source_id} appears frozen, clip contains duplicate frames only')
+            if static and source_id in self.__inferred_sources:
+                self.counters.increment('ml.clips_skipped_static')
+                static_ids.append(source_id)
+            else:
+                source_ids.append(source_id)
+        self.__inferred_sources.update(source_ids)
+        return source_ids, static_ids
+
+    def __infer_batch(self, job: BatchJob) -> None:
+        for source_id in job.static_ids:
+            cache = self.__feature_caches.get(source_id)
+            if cache is not None:
+                cache.append(np.repeat(cache.last()[np.newaxis], job.num_new_tiles[source_id], axis=0))
+        scores = self.__infer(job)
+        for source_id in job.ended_ids:
+            self.__last_scores.pop(source_id, None)
+            self.__feature_caches.pop(source_id, None)
+        self.__pass_on('infer', self.__postprocess_queue, 'postprocess', job._replace(scores=scores))
+
+    def __infer(self, job: BatchJob) -> Dict[int, Dict[str, np.ndarray]]:
+        # Sources skipped as static reuse their last scores
+        scores = dict(self.__last_scores)
+        if len(job.infer_ids) == 0:
+            return scores
+        if job.input_tensor is not None:
+            # Only frames which have not been seen yet go through the feature extractor
+            features = self.__extract_features(job.input_tensor)
+            offset = 0
+            for source_id in job.infer_ids:
+                num_new_tiles = job.num_new_tiles[source_id]
+                if num_new_tiles == 0:
+                    continue
+                cache = self.__feature_caches.get(source_id)
+                if cache is None:
+                    cache = self.__feature_caches[source_id] = FeatureCache(window_size=self.__batch_size,
+                                                                            feature_dim=features.shape[1])
+                cache.append(features[offset:offset + num_new_tiles])
+                offset += num_new_tiles
+
+        windows = self.__get_windows(job.infer_ids)
+        inferred_scores = {self.PRIMARY_HEAD: self.__score_windows(windows)}
+        for accident_type, head_session in self.__head_sessions.items():
+            inferred_scores[accident_type] = head_session.run(windows)
+        self.counters.increment('ml.clips_inferred', len(job.infer_ids))
+        for i, source_id in enumerate(job.infer_ids):
+            # Copied out of the sessions' output buffers, which are overwritten by the next batch
+            scores[source_id] = self.__last_scores[source_id] = {
+                accident_type: type_scores[i].copy() for accident_type, type_scores in inferred_scores.items()}
+        return scores
+
+    def __score_windows(self, windows: np.ndarray) -> np.ndarray:
+        if self.__cascade_head is None:
+            return self.__transformer_session.run(windows)
+        # Accident probability of the screening head, [accident, no accident] like the transformer's scores
+        probabilities = self.__cascade_head.predict(windows)
+        scores = np.stack((probabilities, 1 - probabilities), axis=1).astype(np.float32)
+        passed = probabilities >= self.__cascade_threshold
+        self.counters.increment('ml.clips_screened_out', int(len(passed) - passed.sum()))
+        if passed.any():
+            scores[passed] = self.__transformer_session.run(windows[passed])
+        return scores
+
+    def __send_batch(self, job: BatchJob) -> None:
+        """
+        Frames of the batch's sources are sent interleaved, the last frame of an ended source carries success=False.
+        """
+        for i in range(max(max(len(clip) for clip in job.clips.values()), 1)):
+            for s in job.source_ids:
+                clip = job.clips[s]
+                if i == 0 and len(clip) == 0 and s in job.ended_ids:
+                    self.__on_done((s, None, None, None, None, False))
+                if i >= len(clip):
+                    # All frames of the clip have been sent
+                    continue
+                frame_to_send = clip[i]
+                enc_frame = None
+                if s in job.encode_ids and self.__should_encode(s, job.clip_timestamps[s][i]):
+                    _, enc_frame = cv2.imencode(".jpg", frame_to_send, [int(cv2.IMWRITE_JPEG_QUALITY), 20])
+                is_final_frame = s in job.ended_ids and (i + 1) == len(clip)
+                self.__on_done((s, frame_to_send, enc_frame, job.scores[s], job.clip_timestamps[s][i],
+                                not is_final_frame))
+        for s in job.ended_ids:
+            self.__last_encoded.pop(s, None)
+
+    def __should_encode(self, source_id: int, timestamp: float) -> bool:
+        last_encoded = self.__last_encoded.get(source_id)
+        if (self.__preview_max_fps > 0 and last_encoded is not None and
+                0 <= timestamp - last_encoded < 1 / self.__preview_max_fps):
+            return False
+        self.__last_encoded[source_id] = timestamp
+        return True
+
+    def __extract_features(self, input_tensor: np.ndarray) -> np.ndarray:
+        return self.__feature_extractor_session.run(input_tensor)
+
+    def __get_windows(self, source_ids: List[int]) -> np.ndarray:
+        """
+        Latest batch_size features of each source, copied straight from the caches into a reused buffer.
+        Sources which have not had batch_size frames yet are padded with features of black frames at the end.
+        """
+        windows = self.__windows_buffer
+        if windows is None or len(windows) < len(source_ids):
+            feature_dim = self.__get_blank_features().shape[0]
+            windows = self.__windows_buffer = np.empty(
+                (max(self.__max_clips_per_batch, len(source_ids)), self.__batch_size, feature_dim), dtype=np.float32)
+        for i, source_id in enumerate(source_ids):
+            cache = self.__feature_caches.get(source_id)
+            num_cached = 0
+            if cache is not None:
+                window = cache.window()
+                num_cached = len(window)
+                windows[i, :num_cached] = window
+            if num_cached < self.__batch_size:
+                windows[i, num_cached:] = self.__get_blank_features()
+        return windows[:len(source_ids)]
+
+    def __get_blank_features(self) -> np.ndarray:
+        if self.__blank_features is None:
+            blank_frame = np.zeros((1, self.__img_h, self.__img_w, 3), dtype=np.float32)
+            self.__blank_features = self.__extract_features(blank_frame)[0].copy()
+        return self.__blank_features
+
+    def __get_input_tensor(self, source_ids: List[int], num_new_tiles: Dict[int, int]) -> np.ndarray:
+        """
+        Tiles are resized and converted to RGB by the stream reader. Each uint8 tile is converted to float32 while
+        being copied straight into its slice of one of the rotating input buffers.
+        The returned tensor stays valid while the batch is queued for and run by the inference stage.
+        """
+        num_tiles = sum(num_new_tiles[source_id] for source_id in source_ids)
+        if len(self.__input_buffers) == 0 or len(self.__input_buffers[0]) < num_tiles:
+            shape = (max(self.__max_clips_per_batch * self.__batch_size, num_tiles), self.__img_h, self.__img_w, 3)
+            # One buffer per batch in the inference queue, one being run and one being filled
+            self.__input_buffers = [np.empty(shape, dtype=np.float32) for _ in range(self.__pipeline_depth + 2)]
+        input_buffer = self.__input_buffers[self.__next_input_buffer]
+        self.__next_input_buffer = (self.__next_input_buffer + 1) % len(self.__input_buffers)
+        input_tensor = input_buffer[:num_tiles]
+        i = 0
+        for source_id in source_ids:
+            for tile in self.__batch_data[source_id]['tiles'][:num_new_tiles[source_id]]:
+                np.copyto(input_tensor[i], tile)
+                i += 1
+        return input_tensor
 
-    def __reset_batches(self):
-        self.__batch_data = {source_id: {'frames': data['frames'][self.__batch_size:],
-                                         'ready': (len(data['frames'][self.__batch_size:]) >= self.__batch_size
-                                                   or source_id in self.__last_frame_hit)}
-                             for source_id, data in self.__batch_data.items()}
-
-    def __infer(self) -> np.ndarray:
-        input_tensor = self.__get_input_tensor()
-        features = self.__feature_extractor_session.run(["output_0"], {"inputs": input_tensor})[0]
-        reshaped_features = self.__reshape_input_for_transformer(features=features)
-        return self.__transformer_session.run(["output_0"], {"inputs": reshaped_features})[0]
-
-    def __reshape_input_for_transformer(self, features: np.ndarray) -> np.ndarray:
-        batch_size = int(features.shape[0] / self.__batch_size)
-        reshaped_features_shape = (batch_size, self.__batch_size, features.shape[1])
-        reshaped_features = np.zeros(reshaped_features_shape, dtype=np.float32)
-        for i in range(batch_size):
-            reshaped_features[i] = features[i * self.__batch_size: i * self.__batch_size + self.__batch_size]
-        return reshaped_features
-
-    def __get_input_tensor(self):
-        tensor = np.zeros((len(self.__batch_data) * self.__batch_size,
-                           self.__img_h, self.__img_w, 3), dtype=np.float32)
-
-        for i, source_id in enumerate(self.__batch_data.keys()):
-            num_frames = (self.__batch_size if len(self.__batch_data[source_id]['frames']) > self.__batch_size else
-                          len(self.__batch_data[source_id]['frames']))
-            for j, frame in enumerate(self.__batch_data[source_id]['frames'][:num_frames]):
-                resized_frame = cv2.resize(frame, (self.__img_h, self.__img_w))
-                resized_frame = resized_frame[:, :, [2, 1, 0]]
-                tensor[i * self.__batch_size + j] = resized_frame
-        return tensor.astype(np.float32)
-
-    def __set_batch_ready(self, source_id: int, success: bool) -> None:
-        self.__batch_data[source_id]['ready'] = (not success or
-                                                 len(self.__batch_data[source_id]['frames']) >= self.__batch_size or
-                                                 source_id in self.__last_frame_hit)
-
-    def __all_batches_ready(self):
-        for source_id, data in self.__batch_data.items():
-            if not data['ready']:
-                return False
-
-        return len(self.__batch_data) > 0
+    def __update_ready(self, source_id: int) -> None:
+        """
+        A source is ready to be scored once it has enough new tiles, or once the source has ended.
+        """
+        if (len(self.__batch_data[source_id]['tiles']) >= self.__get_num_tiles_needed(source_id) or
+                source_id in self.__last_frame_hit):
+            self.__batcher.mark_ready(source_id)
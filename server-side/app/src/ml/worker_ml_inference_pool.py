@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .session_factory import SessionConfig, validate
+from .worker_ml_inference import WorkerMLInference
+
+
+class WorkerMLInferencePool:
+    """
+    Shards sources over num_workers WorkerMLInference processes, each with its own ONNX sessions
+    and, unless configured otherwise, an equal share of the CPU cores as its intra-op thread budget.
+    A source is placed on the least loaded worker when its first frame arrives and stays there until its
+    end of stream marker has been passed on, as its clips and cached features live in that worker.
+    Placement happens in add(), i.e. in the stream reader process, which is the only caller.
+    """
+
+    def __init__(self, on_done: callable, num_workers: int = 1,
+                 extractor_session_config: SessionConfig = SessionConfig(
+                     providers=('CUDAExecutionProvider', 'CPUExecutionProvider')),
+                 transformer_session_config: SessionConfig = SessionConfig(),
+                 **worker_params) -> None:
+        """
+        worker_params: passed on to each WorkerMLInference.
+        """
+        validate(extractor_session_config)
+        validate(transformer_session_config)
+        num_workers = max(1, num_workers)
+        intra_op_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        if extractor_session_config.intra_op_threads == 0:
+            extractor_session_config = extractor_session_config._replace(intra_op_threads=intra_op_threads)
+        if transformer_session_config.intra_op_threads == 0:
+            transformer_session_config = transformer_session_config._replace(intra_op_threads=intra_op_threads)
+        self.workers: List[WorkerMLInference] = [
+            WorkerMLInference(on_done=on_done, extractor_session_config=extractor_session_config,
+                              transformer_session_config=transformer_session_config,
+                              name=f'PROCESS_worker_ml_inference_{i}', **worker_params)
+            for i in range(num_workers)]
+        # source_id -> index of the worker it is placed on, maintained in the stream reader process
+        self.__placement: Dict[int, int] = {}
+        self.__num_sources = [0] * num_workers
+        # Decoder threads of the reader add frames concurrently
+        self.__lock = threading.Lock()
+
+    def add(self, data) -> None:
+        """
+        queue.Full of the source's worker is passed on, the source keeps its placement for the retry.
+        """
+        source_id, _, success = data
+        with self.__lock:
+            worker_index = self.__placement.get(source_id)
+            if worker_index is None:
+                worker_index = min(range(len(self.workers)), key=lambda i: self.__num_sources[i])
+                self.__placement[source_id] = worker_index
+                self.__num_sources[worker_index] += 1
+            if not success:
+                # End of stream, the source is placed anew if it is started again
+                del self.__placement[source_id]
+                self.__num_sources[worker_index] -= 1
+        self.workers[worker_index].add(data)
+        if not success:
+            # Parameters were sent to all workers, the source's own worker drops them with the marker
+            for i, worker in enumerate(self.workers):
+                if i != worker_index:
+                    worker.remove_source(source_id)
+
+    def get_worker_index(self, source_id: int) -> Optional[int]:
+        with self.__lock:
+            return self.__placement.get(source_id)
+
+    def update_source(self, source_id: int, **params) -> None:
+        """
+        The source's worker is only known in the reader process, so parameters are sent to all workers.
+        """
+        for worker in self.workers:
+            worker.update_source(source_id, **params)
+
+    def wait_ready(self, timeout: float) -> bool:
+        """
+        Blocks until all workers have created and warmed up their sessions, returns False on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        return all(worker.ready.wait(max(0.0, deadline - time.monotonic())) for worker in self.workers)
+
+    def get_counters(self) -> Dict[str, int]:
+        """
+        Counters summed over all workers.
+        """
+        counters = {name: 0 for name in WorkerMLInference.COUNTERS}
+        for worker in self.workers:
+            for name, value in worker.counters.snapshot().items():
+                counters[name] += value
+        counters['ml.workers'] = len(self.workers)
+        return counters
+
+    def start(self) -> None:
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self) -> None:
+        for worker in self.workers:
+            worker.stop()
@@ -1,3 +1,5 @@
 from .source_status import SourceStatus
 from .accident_type import AccidentType, accident_type_str_map
 from .source_type import SourceType
+from .admission_policy import AdmissionPolicy
+from .stream_protocol import StreamProtocol
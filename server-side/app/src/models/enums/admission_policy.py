@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class AdmissionPolicy(str, Enum):
+    # Frames of a source over its quota of unread frames replace its oldest unread ones
+    DROP_OLDEST = "DROP_OLDEST"
+    # New frames of a source over its quota are not read at all
+    DROP_NEWEST = "DROP_NEWEST"
+    # New frames of a source over its quota are streamed, but not inferred on
+    DEGRADE = "DEGRADE"
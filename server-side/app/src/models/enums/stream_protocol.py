@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class StreamProtocol(str, Enum):
+    # A binary JPEG message followed by a JSON message with the scores
+    JSON = "JSON"
+    # A single binary message per frame, see services/stream_message.py
+    BINARY = "BINARY"
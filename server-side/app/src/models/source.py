@@ -4,7 +4,7 @@ from sqlalchemy import Column, Integer, String, DateTime, Float
 from sqlalchemy import Enum as EnumType
 from sqlalchemy.orm import relationship
 
-from .enums import SourceStatus, SourceType
+from .enums import SourceStatus, SourceType, AdmissionPolicy
 from ..database import Base
 
 
@@ -23,5 +23,12 @@ class Source(Base):
     width = Column(Float)
     source_type = Column(EnumType(SourceType), default=SourceType.VIDEO)
     stream_url = Column(String(250))
+    # Infer on every n-th frame only, inference_fps (if set) takes precedence
+    inference_stride = Column(Integer, default=1)
+    inference_fps = Column(Float, nullable=True)
+    # Clips changing less than this (mean absolute pixel difference) reuse the previous scores, None disables
+    motion_threshold = Column(Float, nullable=True)
+    # What to do with frames once the source has too many unread frames, None uses the server default
+    admission_policy = Column(EnumType(AdmissionPolicy), nullable=True)
 
     accidents = relationship("Accident", back_populates="source")
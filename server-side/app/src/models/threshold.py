@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, Float
 
 from ..database import Base
+from .enums import AccidentType
 
 
 class Threshold(Base):
@@ -8,3 +9,18 @@ class Threshold(Base):
 
     id = Column(Integer, primary_key=True)
     car_crash_threshold = Column(Float, default=0.8)
+    fire_threshold = Column(Float, default=0.8)
+    violence_threshold = Column(Float, default=0.8)
+
+    # Alarm score threshold column of each accident type
+    columns_by_type = {
+        AccidentType.CAR_CRASH: 'car_crash_threshold',
+        AccidentType.FIRE: 'fire_threshold',
+        AccidentType.VIOLENCE: 'violence_threshold',
+    }
+
+    def get_for(self, accident_type: AccidentType) -> float:
+        return getattr(self, self.columns_by_type[accident_type])
+
+    def set_for(self, accident_type: AccidentType, value: float) -> None:
+        setattr(self, self.columns_by_type[accident_type], value)
@@ -1,6 +1,6 @@
 from .source import SourceCreate, SourceRead, SourceBase, SourceReadDetailed
 from .accident import AccidentRead, AccidentCreate
-from .threshold import CarCrashThresholdRead, CarCrashThresholdUpdate
+from .threshold import CarCrashThresholdRead, CarCrashThresholdUpdate, ThresholdRead
 from .recipient import RecipientRead
 from .user import UserCreate, UserRead
 from .token import Token, TokenData
@@ -3,7 +3,7 @@ from typing import Optional
 
 from pydantic import BaseModel
 
-from ..models.enums import SourceStatus, SourceType
+from ..models.enums import SourceStatus, SourceType, AdmissionPolicy
 
 
 class SourceBase(BaseModel):
@@ -11,6 +11,10 @@ class SourceBase(BaseModel):
     description: str
     source_type: SourceType
     stream_url: Optional[str] = None
+    inference_stride: Optional[int] = 1
+    inference_fps: Optional[float] = None
+    motion_threshold: Optional[float] = None
+    admission_policy: Optional[AdmissionPolicy] = None
 
 
 class SourceCreate(SourceBase):
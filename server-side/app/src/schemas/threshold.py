@@ -14,3 +14,12 @@ class CarCrashThresholdRead(BaseModel):
 
 class CarCrashThresholdUpdate(BaseModel):
     car_crash_threshold: float
+
+
+class ThresholdRead(BaseModel):
+    car_crash_threshold: float
+    fire_threshold: float
+    violence_threshold: float
+
+    class ConfigDict:
+        from_attributes = True
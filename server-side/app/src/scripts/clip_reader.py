@@ -0,0 +1,29 @@
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+
+def read_clips(video_path: str, batch_size: int = 30, img_h: int = 128, img_w: int = 128) -> Iterator[np.ndarray]:
+    """
+    Yields non-overlapping clips of (batch_size, img_h, img_w, 3) float32 RGB tiles, preprocessed as by the
+    stream reader. The last clip is padded with black frames, like clips of ended sources in WorkerMLInference.
+    """
+    cap = cv2.VideoCapture(video_path)
+    clip = np.zeros((batch_size, img_h, img_w, 3), dtype=np.float32)
+    num_frames = 0
+    try:
+        while 1:
+            success, frame = cap.read()
+            if not success:
+                break
+            clip[num_frames] = cv2.cvtColor(cv2.resize(frame, (img_w, img_h)), cv2.COLOR_BGR2RGB)
+            num_frames += 1
+            if num_frames == batch_size:
+                yield clip.copy()
+                clip[:] = 0
+                num_frames = 0
+        if num_frames > 0:
+            yield clip
+    finally:
+        cap.release()
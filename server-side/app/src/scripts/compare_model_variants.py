@@ -0,0 +1,72 @@
+import csv
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.src.ml import SessionConfig, create_session, get_model_variant
+from app.src.scripts.clip_reader import read_clips
+
+ACCIDENT_CLASS_ID = 0
+BATCH_SIZE = 30
+
+
+def read_labels(labels_path: str) -> List[Tuple[str, int]]:
+    """
+    CSV with a video_path,label header, label is 1 if the video contains an accident, 0 otherwise.
+    """
+    with open(labels_path, newline='') as f:
+        return [(row['video_path'], int(row['label'])) for row in csv.DictReader(f)]
+
+
+def run_variant(variant: str, video_paths: List[str]) -> Tuple[Dict[str, np.ndarray], float]:
+    """
+    Returns accident scores of every clip of each video and frames/second of inference (preprocessing excluded).
+    """
+    model_paths = get_model_variant(variant)
+    feature_extractor_session = create_session(model_paths.feature_extractor_path, SessionConfig())
+    transformer_session = create_session(model_paths.transformer_path, SessionConfig())
+    scores, num_frames, inference_time = {}, 0, 0.0
+    for video_path in video_paths:
+        video_scores = []
+        for clip in read_clips(video_path, batch_size=BATCH_SIZE):
+            started = time.perf_counter()
+            features = feature_extractor_session.run(["output_0"], {"inputs": clip})[0]
+            clip_scores = transformer_session.run(["output_0"], {"inputs": features[np.newaxis]})[0][0]
+            inference_time += time.perf_counter() - started
+            num_frames += len(clip)
+            video_scores.append(clip_scores[ACCIDENT_CLASS_ID])
+        scores[video_path] = np.array(video_scores)
+    return scores, num_frames / inference_time if inference_time > 0 else 0.0
+
+
+def compare(labels_path: str, baseline: str, candidate: str, threshold: float) -> None:
+    labels = read_labels(labels_path)
+    video_paths = [video_path for video_path, _ in labels]
+    baseline_scores, baseline_fps = run_variant(baseline, video_paths)
+    candidate_scores, candidate_fps = run_variant(candidate, video_paths)
+
+    drift = np.concatenate([np.abs(baseline_scores[v] - candidate_scores[v]) for v in video_paths])
+    clip_agreement = np.concatenate([(baseline_scores[v] >= threshold) == (candidate_scores[v] >= threshold)
+                                     for v in video_paths])
+    print(f'Videos: {len(video_paths)}, clips: {len(drift)}, threshold: {threshold}')
+    print(f'Score drift: mean {drift.mean():.4f}, p95 {np.percentile(drift, 95):.4f}, max {drift.max():.4f}')
+    print(f'Clip detection agreement: {clip_agreement.mean() * 100:.2f}%')
+    for variant, scores, fps in ((baseline, baseline_scores, baseline_fps),
+                                 (candidate, candidate_scores, candidate_fps)):
+        # A video is detected as containing an accident if any of its clips is above the threshold
+        correct = [int(scores[v].max(initial=0.0) >= threshold) == label for v, label in labels]
+        print(f'{variant}: video accuracy {np.mean(correct) * 100:.2f}%, {fps:.1f} frames/s')
+    print(f'Speedup: {candidate_fps / baseline_fps:.2f}x' if baseline_fps > 0 else '')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('ERROR. Usage: python -m app.src.scripts.compare_model_variants <labels.csv> <candidate_variant> '
+              '[<baseline_variant>=fp32] [<threshold>=0.8]')
+        exit()
+
+    compare(labels_path=sys.argv[1], candidate=sys.argv[2],
+            baseline=sys.argv[3] if len(sys.argv) > 3 else 'fp32',
+            threshold=float(sys.argv[4]) if len(sys.argv) > 4 else 0.8)
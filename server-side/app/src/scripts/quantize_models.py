@@ -0,0 +1,60 @@
+import sys
+from typing import List
+
+import numpy as np
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic,
+                                      quantize_static)
+
+from app.src.ml import SessionConfig, create_session, get_model_variant
+from app.src.scripts.clip_reader import read_clips
+
+
+class ClipDataReader(CalibrationDataReader):
+    """
+    Feeds calibration clips of the given videos to the feature extractor, or their features to the transformer.
+    """
+
+    def __init__(self, video_paths: List[str], feature_extractor_session=None) -> None:
+        self.__video_paths = video_paths
+        self.__feature_extractor_session = feature_extractor_session
+        self.__inputs = self.__get_inputs()
+
+    def get_next(self):
+        return next(self.__inputs, None)
+
+    def __get_inputs(self):
+        for video_path in self.__video_paths:
+            for clip in read_clips(video_path):
+                if self.__feature_extractor_session is None:
+                    yield {'inputs': clip}
+                else:
+                    features = self.__feature_extractor_session.run(["output_0"], {"inputs": clip})[0]
+                    yield {'inputs': features[np.newaxis]}
+
+
+def quantize(method: str, calibration_videos: List[str]) -> None:
+    fp32 = get_model_variant('fp32')
+    quantized = get_model_variant(f'int8_{method}')
+    if method == 'dynamic':
+        quantize_dynamic(fp32.feature_extractor_path, quantized.feature_extractor_path, weight_type=QuantType.QInt8)
+        quantize_dynamic(fp32.transformer_path, quantized.transformer_path, weight_type=QuantType.QInt8)
+    else:
+        # Transformer activations are calibrated on features of the original extractor
+        feature_extractor_session = create_session(fp32.feature_extractor_path, SessionConfig())
+        quantize_static(fp32.feature_extractor_path, quantized.feature_extractor_path,
+                        ClipDataReader(calibration_videos), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+        quantize_static(fp32.transformer_path, quantized.transformer_path,
+                        ClipDataReader(calibration_videos, feature_extractor_session), quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+    print(f'Saved {quantized.feature_extractor_path} and {quantized.transformer_path}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('dynamic', 'static') or (sys.argv[1] == 'static' and
+                                                                          len(sys.argv) < 3):
+        print('ERROR. Usage: python -m app.src.scripts.quantize_models dynamic\n'
+              '       python -m app.src.scripts.quantize_models static <calibration_video> [<calibration_video> ...]')
+        exit()
+
+    quantize(method=sys.argv[1], calibration_videos=sys.argv[2:])
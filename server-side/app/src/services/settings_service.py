@@ -3,6 +3,7 @@ from pydantic_core._pydantic_core import ValidationError
 from sqlalchemy.orm import Session
 
 from ..models import Threshold, Recipient
+from ..models.enums import AccidentType
 from ..models.validation_models import ThresholdRangeValidator, EmailValidator
 
 
@@ -20,7 +21,7 @@ class SettingsService:
             raise HTTPException(status_code=404, detail=f'Server could not find threshold setting!')
         return threshold
 
-    def update_threshold(self, db: Session, new_thr: float):
+    def update_threshold(self, db: Session, new_thr: float, accident_type: AccidentType = AccidentType.CAR_CRASH):
         try:
             ThresholdRangeValidator(threshold=new_thr)
         except ValidationError as e:
@@ -28,7 +29,7 @@ class SettingsService:
         db_threshold = self.get_threshold(db)
         if db_threshold is None:
             raise HTTPException(status_code=404, detail=f'Server could not find threshold setting!')
-        db_threshold.car_crash_threshold = new_thr
+        db_threshold.set_for(accident_type, new_thr)
         db.commit()
 
         return db_threshold
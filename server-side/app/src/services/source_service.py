@@ -1,5 +1,4 @@
 import asyncio
-import multiprocessing
 import os
 import queue
 import shutil
@@ -9,7 +8,7 @@ import time
 import traceback
 from datetime import datetime
 from multiprocessing import Queue
-from typing import List, Dict, Any
+from typing import List, Dict
 
 import cv2
 import numpy as np
@@ -18,13 +17,26 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 
 from ..email import EmailManager
-from ..ml import WorkerMLInference
+from ..ml import WorkerMLInferencePool, SessionConfig
 from ..models import Source, Accident, Recipient, Threshold
-from ..models.enums import SourceStatus, AccidentType, accident_type_str_map, SourceType
+from ..models.enums import (SourceStatus, AccidentType, accident_type_str_map, SourceType, AdmissionPolicy,
+                            StreamProtocol)
 from ..schemas import SourceCreate, SourceReadDetailed
 from ..stream import WorkerStreamReader
-from ..utilities import FileSize, generate_file_path, get_adjusted_timezone, delete_file, file_exists
+from ..utilities import (FileSize, generate_file_path, get_adjusted_timezone, delete_file, file_exists,
+                         SharedCounters)
 from ..database import SessionLocal
+from .source_stream_state import SourceStreamState, StreamClient
+from .stream_message import pack_frame_message
+from ..settings import (FRAME_RING_SLOTS, PREVIEW_MAX_WIDTH, VIDEO_MAX_SPEED, ML_MAX_CLIPS_PER_BATCH,
+                        ML_MAX_BATCH_WAIT, ML_WINDOW_STRIDE, ML_PIPELINE_DEPTH,
+                        PREVIEW_MAX_FPS, ML_NUM_WORKERS, ML_EXTRACTOR_PROVIDERS, ML_TRANSFORMER_PROVIDERS,
+                        ML_EXTRACTOR_INTRA_OP_THREADS, ML_TRANSFORMER_INTRA_OP_THREADS, ML_INTER_OP_THREADS,
+                        ML_EXECUTION_MODE, ML_GRAPH_OPTIMIZATION_LEVEL, ML_EXTRACTOR_THREAD_AFFINITY,
+                        ML_TRANSFORMER_THREAD_AFFINITY, ML_MODEL_CACHE_DIR, ML_READY_TIMEOUT,
+                        ML_MODEL_VARIANT, ML_CASCADE_HEAD_PATH, ML_CASCADE_THRESHOLD,
+                        ML_HEADS, FRAME_ADMISSION_POLICY, FRAME_ADMISSION_QUOTA,
+                        FRAME_RING_RELEASE_TIMEOUT)
 
 
 class SourceService:
@@ -32,44 +44,82 @@ class SourceService:
     # TODO add repository class
     def __init__(self):
         self.file_size_limit_bytes = FileSize.GB
-        # Object for creating objects shared across processes
-        self.__manager = multiprocessing.Manager()
-        self.__shared_sources_dict = self.__manager.dict()
         # Active websocket connections
-        self.__connections: Dict[int, List[WebSocket]] = {}
+        self.__connections: Dict[int, List[StreamClient]] = {}
+        # Messages waiting for a slow client, older ones are dropped. The end of stream message and close need 2.
+        self.__client_queue_size = 2
         # Queue of frames which have been inferred on and are ready for streaming
         self.__frames_queue = Queue(maxsize=100)
-        self.__internal_state: Dict[int, Dict[str, Any]] = {}
+        self.__stream_states: Dict[int, SourceStreamState] = {}
         self.__sources_to_terminate = []
         self.__frames_buffer_size = 30
+        self.__max_buffered_frames = 1000
+        # Sources lagging behind their presentation times more than this many seconds restart pacing from now
+        self.__max_stream_lag = 1.0
         self.__alarm_timeout = 3
         self.__video_cache_seconds = 10
         self.__accident_class_id = 0
-        self.__alarm_score_thr = 0.8
+        self.__alarm_score_thrs: Dict[AccidentType, float] = {accident_type: 0.8 for accident_type in AccidentType}
         self.__thr_update_counter = 0
         # Whether streaming job is active
         self.__job_started = False
+        self.__frames_receiver = None
+        # Shared with the ML workers, which put processed frames to the queue
+        self.__counters = SharedCounters(('service.dropped_queue_full', 'service.dropped_slow_client'))
 
         # Email
         self.__email_manager = EmailManager()
 
         # Workers
-        self.__worker_ml_inference = WorkerMLInference(on_done=self.__put_processed_frames_to_queue,
-                                                       batch_size=30)
-        self.__worker_stream_reader = WorkerStreamReader(shared_sources_dict=self.__shared_sources_dict,
-                                                         on_done=self.__worker_ml_inference.add)
+        self.__worker_ml_inference_pool = WorkerMLInferencePool(
+            on_done=self.__put_processed_frames_to_queue,
+            num_workers=ML_NUM_WORKERS,
+            extractor_session_config=SessionConfig(providers=tuple(ML_EXTRACTOR_PROVIDERS.split(',')),
+                                                   intra_op_threads=ML_EXTRACTOR_INTRA_OP_THREADS,
+                                                   inter_op_threads=ML_INTER_OP_THREADS,
+                                                   execution_mode=ML_EXECUTION_MODE,
+                                                   graph_optimization_level=ML_GRAPH_OPTIMIZATION_LEVEL,
+                                                   thread_affinity=ML_EXTRACTOR_THREAD_AFFINITY),
+            transformer_session_config=SessionConfig(providers=tuple(ML_TRANSFORMER_PROVIDERS.split(',')),
+                                                     intra_op_threads=ML_TRANSFORMER_INTRA_OP_THREADS,
+                                                     inter_op_threads=ML_INTER_OP_THREADS,
+                                                     execution_mode=ML_EXECUTION_MODE,
+                                                     graph_optimization_level=ML_GRAPH_OPTIMIZATION_LEVEL,
+                                                     thread_affinity=ML_TRANSFORMER_THREAD_AFFINITY),
+            batch_size=30,
+            max_clips_per_batch=ML_MAX_CLIPS_PER_BATCH,
+            max_batch_wait=ML_MAX_BATCH_WAIT,
+            window_stride=ML_WINDOW_STRIDE,
+            pipeline_depth=ML_PIPELINE_DEPTH,
+            model_cache_dir=ML_MODEL_CACHE_DIR,
+            model_variant=ML_MODEL_VARIANT,
+            cascade_head_path=ML_CASCADE_HEAD_PATH,
+            cascade_threshold=ML_CASCADE_THRESHOLD,
+            heads={AccidentType(accident_type).value: path for accident_type, path in ML_HEADS.items()},
+            preview_max_fps=PREVIEW_MAX_FPS)
+        self.__worker_stream_reader = WorkerStreamReader(on_done=self.__worker_ml_inference_pool.add,
+                                                         ring_slots=FRAME_RING_SLOTS,
+                                                         model_input_size=(128, 128),
+                                                         preview_max_width=PREVIEW_MAX_WIDTH,
+                                                         admission_quota=FRAME_ADMISSION_QUOTA,
+                                                         ring_release_timeout=FRAME_RING_RELEASE_TIMEOUT)
         self.__worker_stream_reader.start()
-        self.__worker_ml_inference.start()
+        self.__worker_ml_inference_pool.start()
 
     def start_workers(self):
         self.__worker_stream_reader.start()
-        self.__worker_ml_inference.start()
+        self.__worker_ml_inference_pool.start()
 
     def stop_workers(self):
         self.__worker_stream_reader.stop()
-        self.__worker_ml_inference.stop()
+        self.__worker_ml_inference_pool.stop()
 
     def upload_source(self, db: Session, source_create: SourceCreate, video_file: UploadFile, stream_url: str):
+        if source_create.inference_stride < 1 or (source_create.inference_fps is not None and
+                                                  source_create.inference_fps <= 0):
+            raise HTTPException(status_code=400, detail='Inference stride and FPS must be positive!')
+        if source_create.motion_threshold is not None and source_create.motion_threshold < 0:
+            raise HTTPException(status_code=400, detail='Motion threshold must not be negative!')
         if source_create.source_type == SourceType.STREAM:
             if stream_url is None:
                 raise HTTPException(status_code=400, detail=f'No stream URL provided!')
@@ -104,6 +154,9 @@ class SourceService:
                         file_path=source_path if source_create.source_type == SourceType.VIDEO else None,
                         stream_url=source_path if source_create.source_type == SourceType.STREAM else None,
                         fps=fps, width=width, height=height, source_type=source_create.source_type,
+                        inference_stride=source_create.inference_stride, inference_fps=source_create.inference_fps,
+                        motion_threshold=source_create.motion_threshold,
+                        admission_policy=source_create.admission_policy,
                         created_at=datetime.utcnow())
         video_cap.release()
         db.add(source)
@@ -132,41 +185,65 @@ class SourceService:
             raise HTTPException(status_code=404, detail=f'Source (id={source_id}) file not found')
         if db_source.status == SourceStatus.PROCESSING:
             raise HTTPException(status_code=404, detail=f'Source (id={source_id}) is already live!')
+        # Workers load and warm up their models after startup, do not block the event loop meanwhile
+        workers_ready = await asyncio.get_running_loop().run_in_executor(
+            None, self.__worker_ml_inference_pool.wait_ready, ML_READY_TIMEOUT)
+        if not workers_ready:
+            raise HTTPException(status_code=503, detail='Inference workers are still starting, try again later!')
 
         if not self.__job_started:
-            asyncio.create_task(self.__stream_to_client())
-            self.__job_started = True
+            self.__start_streaming_job()
 
+        admission_policy = (db_source.admission_policy or AdmissionPolicy(FRAME_ADMISSION_POLICY)).value
+        max_speed = VIDEO_MAX_SPEED and db_source.source_type == SourceType.VIDEO
+        self.__worker_ml_inference_pool.update_source(source_id, motion_threshold=db_source.motion_threshold,
+                                                      viewers=0, admission_policy=admission_policy,
+                                                      admission_quota=FRAME_ADMISSION_QUOTA, max_speed=max_speed)
         self.__worker_stream_reader.add_source(source_id,
                                                db_source.file_path if db_source.source_type == SourceType.VIDEO
-                                               else db_source.stream_url)
-        self.__internal_state[source_id] = {'q': queue.Queue(maxsize=1000),
-                                            'ready': False,
-                                            'last_sent_time': time.time(),
-                                            'last_fps_measure_time': time.time(),
-                                            'wait_time': 1 / db_source.fps,
-                                            'set_fps': db_source.fps,
-                                            'num_sent': 0,
-                                            'actual_fps': db_source.fps,
-                                            'last_alarm_time': None,
-                                            'source_fps': db_source.fps,
-                                            'source_h': db_source.height,
-                                            'source_w': db_source.width,
-                                            'video_cache_num_frames': self.__video_cache_seconds * db_source.fps,
-                                            'video_cache': []}
+                                               else db_source.stream_url,
+                                               max_speed=max_speed,
+                                               live=db_source.source_type == SourceType.STREAM,
+                                               inference_stride=self.__get_inference_stride(db_source),
+                                               admission_policy=admission_policy)
+        state = SourceStreamState(source_id=source_id, source_fps=db_source.fps, source_h=db_source.height,
+                                  source_w=db_source.width,
+                                  video_cache_num_frames=self.__video_cache_seconds * db_source.fps,
+                                  max_buffered_frames=self.__max_buffered_frames)
+        state.task = asyncio.create_task(self.__stream_source(state))
+        self.__stream_states[source_id] = state
         self.__connections[source_id] = []
         db_source.status = SourceStatus.PROCESSING
         db.commit()
         return {'detail': f'Source (id={source_id}) is being streamed.'}
 
-    async def accept_connection(self, source_id: int, websocket: WebSocket):
+    @staticmethod
+    def __get_inference_stride(db_source: Source) -> int:
+        if db_source.inference_fps and db_source.fps:
+            return max(1, round(db_source.fps / db_source.inference_fps))
+        return db_source.inference_stride or 1
+
+    async def accept_connection(self, source_id: int, websocket: WebSocket,
+                                protocol: StreamProtocol = StreamProtocol.JSON):
+        """
+        protocol: JSON sends each frame as a binary JPEG message followed by a JSON message with its scores,
+        BINARY as a single message, see stream_message. Control messages (e.g. end of stream) are JSON in both.
+        """
         if (source_id not in self.__connections or
                 source_id in self.__sources_to_terminate):
             await websocket.close()
             return
 
         await websocket.accept()
-        self.__connections[source_id].append(websocket)
+        client = StreamClient(websocket=websocket, protocol=protocol, max_messages=self.__client_queue_size,
+                              counters=self.__counters)
+        client.task = asyncio.create_task(self.__send_to_client(source_id, client))
+        state = self.__stream_states.get(source_id)
+        if state is not None and state.latest_frame is not None:
+            # Late joiners get the latest frame right away
+            client.put_latest(self.__get_frame_message(state, protocol))
+        self.__connections[source_id].append(client)
+        self.__update_viewers(source_id)
         try:
             while True:
                 # The websocket will be destroyed if this method terminates.
@@ -174,64 +251,145 @@ class SourceService:
                 # data is continuously sent to clients.
                 await websocket.receive_text()
         except WebSocketDisconnect:
-            print('socket disconnected from client, but not removing from list yet', source_id)
+            print('socket disconnected from client, removed from list', source_id)
+            self.__remove_connection(source_id, client)
+
+    def __remove_connection(self, source_id: int, client: StreamClient):
+        if client in self.__connections.get(source_id, []):
+            self.__connections[source_id].remove(client)
+            self.__update_viewers(source_id)
+            if client.task is not asyncio.current_task():
+                client.task.cancel()
+
+    async def __send_to_client(self, source_id: int, client: StreamClient):
+        while True:
+            message = await client.messages.get()
+            try:
+                if message is None:
+                    await client.websocket.close()
+                    return
+                for part in message:
+                    if isinstance(part, bytes):
+                        await client.websocket.send_bytes(part)
+                    else:
+                        await client.websocket.send_json(part)
+            except (WebSocketDisconnect, RuntimeError):
+                # Socket already disconnected from client
+                print('socket disconnected from client during streaming, removed from list', source_id)
+                self.__remove_connection(source_id, client)
+                return
+
+    def __broadcast(self, source_id: int, message):
+        """
+        Never waits for the clients, each one's task sends the message.
+        """
+        for client in self.__connections[source_id]:
+            client.put_latest(message)
 
-    async def __stream_to_client(self):
-        while 1:
+    def __broadcast_frame(self, state: SourceStreamState):
+        for client in self.__connections[state.source_id]:
+            client.put_latest(self.__get_frame_message(state, client.protocol))
+
+    @staticmethod
+    def __get_frame_message(state: SourceStreamState, protocol: StreamProtocol):
+        message = state.latest_messages.get(protocol)
+        if message is not None:
+            return message
+        enc_frame, scores, timestamp, seq = state.latest_frame
+        if protocol == StreamProtocol.BINARY:
+            message = (pack_frame_message(source_id=state.source_id, seq=seq, timestamp=timestamp, scores=scores,
+                                          enc_frame=enc_frame),)
+        else:
+            message = (enc_frame, {'scores': scores[AccidentType.CAR_CRASH].tolist(),
+                                   'scores_by_type': {accident_type: type_scores.tolist()
+                                                      for accident_type, type_scores in scores.items()}})
+        state.latest_messages[protocol] = message
+        return message
+
+    def __update_viewers(self, source_id: int):
+        # Preview frames are only encoded by the ML worker for sources with viewers
+        self.__worker_ml_inference_pool.update_source(source_id, viewers=len(self.__connections[source_id]))
+
+    def __start_streaming_job(self):
+        self.__frames_receiver = threading.Thread(target=self.__receive_frames, args=(asyncio.get_running_loop(),),
+                                                  name='THREAD_frames_receiver', daemon=True)
+        self.__frames_receiver.start()
+        self.__job_started = True
+
+    def __receive_frames(self, loop: asyncio.AbstractEventLoop):
+        """
+        Runs in its own thread, blocking on the multiprocessing frames queue, so the event loop neither polls it,
+        nor waits for it. Each frame is handed over to the event loop as soon as it arrives.
+        """
+        while True:
             try:
-                source_id, frame, enc_frame, scores, success = self.__frames_queue.get(block=False)
-                # print(f'Internal frames q size: {self.__internal_state[source_id]["q"].qsize()}')
-                self.__internal_state[source_id]['q'].put((source_id, frame, enc_frame, scores, success), block=False)
-                self.__set_internal_q_buffer_ready(source_id)
-            except queue.Empty:
-                source_ids = list(self.__internal_state.keys())
-                if len(source_ids) == 0:
-                    await self.__rest()
-                for source_id in source_ids:
-                    if self.__frame_ready_for_stream(source_id=source_id):
-                        await self.__handle_stream(source_id=source_id)
-                # Allow other requests to process
-                await asyncio.sleep(0.01)
-            except queue.Full:
-                # TODO. Duplicate code
-                print(f'Internal frames queue was full. Dropping frames!')
-                source_ids = list(self.__internal_state.keys())
-                for source_id in source_ids:
-                    if self.__frame_ready_for_stream(source_id=source_id):
-                        await self.__handle_stream(source_id=source_id)
-                # Allow other requests to process
-                await asyncio.sleep(0.01)
+                data = self.__frames_queue.get()
+                loop.call_soon_threadsafe(self.__on_frame_received, data)
             except BaseException as e:
                 e_type, e_object, e_traceback = sys.exc_info()
                 print(f'{threading.current_thread().name}\n'
                       f'Error:{e_type}:{e_object}\n{"".join(traceback.format_tb(e_traceback))}')
 
-    async def __handle_stream(self, source_id: int):
-        try:
-            _, frame, enc_frame, scores, success = self.__internal_state[source_id]['q'].get(block=False)
-        except queue.Empty:
+    def __on_frame_received(self, data):
+        source_id, _, _, _, _, success = data
+        state = self.__stream_states.get(source_id)
+        if state is None:
             return
-        if success and enc_frame is not None:
+        if state.frames.full():
+            if success:
+                print(f'Internal frames queue was full. Dropping frames!')
+                return
+            # The end of stream marker must get through, the oldest frame makes room for it
+            state.frames.get_nowait()
+        state.frames.put_nowait(data)
+        if not success or state.frames.qsize() >= self.__frames_buffer_size:
+            # Streams shorter than the buffer must still end
+            state.buffered.set()
+
+    async def __stream_source(self, state: SourceStreamState):
+        """
+        Streams the source's frames, each one at its presentation time, until its end of stream marker.
+        Presentation times follow the capture timestamps, delayed by the time it took to buffer the first frames.
+        """
+        await state.buffered.wait()
+        print(f'Buffered frames for source {state.source_id}, will start streaming!')
+        while True:
+            data = await state.frames.get()
+            try:
+                _, _, _, _, timestamp, success = data
+                if success:
+                    await asyncio.sleep(self.__time_until_presentation(state, timestamp))
+                await self.__handle_stream(state, data)
+            except BaseException as e:
+                e_type, e_object, e_traceback = sys.exc_info()
+                print(f'{threading.current_thread().name}\n'
+                      f'Error:{e_type}:{e_object}\n{"".join(traceback.format_tb(e_traceback))}')
+            if not success:
+                return
+
+    def __time_until_presentation(self, state: SourceStreamState, timestamp: float) -> float:
+        now = asyncio.get_running_loop().time()
+        if state.time_offset is None or now - (timestamp + state.time_offset) > self.__max_stream_lag:
+            # First frame, or fallen too far behind (e.g. after a pause), pacing restarts from now
+            state.time_offset = now - timestamp
+        return max(0.0, timestamp + state.time_offset - now)
+
+    async def __handle_stream(self, state: SourceStreamState, data):
+        source_id = state.source_id
+        _, frame, enc_frame, scores, timestamp, success = data
+        if success:
             if source_id in self.__sources_to_terminate:
                 # Client removed source, shouldn't process the leftover incoming frames for source.
                 # Socket object will be destroyed, once success==False is received.
                 return
-            self.__handle_video_cache(source_id=source_id, frame=frame)
-            await self.__handle_accident(source_id=source_id, scores=scores,
-                                         enc_frame=enc_frame)
-            ws_to_remove = []
-            # Make shallow copy. If new connection gets appended during the following loop, no unwanted behavior will occur.
-            current_ws_conns = self.__connections[source_id][:]
-            for ws in current_ws_conns:
-                try:
-                    await ws.send_bytes(enc_frame.tobytes())
-                    await ws.send_json({'scores': scores.tolist()})
-                except (WebSocketDisconnect, RuntimeError):
-                    ws_to_remove.append(ws)
-            self.__update_fps_info(source_id=source_id)
-            for ws in ws_to_remove:
-                print('socket disconnected from client during streaming, removed from list', source_id)
-                self.__connections[source_id].remove(ws)
+            state.video_cache.append(frame)
+            await self.__handle_accident(state=state, scores=scores, frame=frame)
+            state.seq += 1
+            # Frames are not encoded while there are no viewers, or above the preview frame rate.
+            if enc_frame is not None:
+                state.latest_frame = (enc_frame.tobytes(), scores, timestamp, state.seq)
+                state.latest_messages = {}
+                self.__broadcast_frame(state)
         else:
             # Stream ended
             print('ENDED, ', source_id)
@@ -239,109 +397,62 @@ class SourceService:
                 self.__temp_set_source_status_processed(source_id=source_id)
             else:
                 self.__sources_to_terminate.remove(source_id)
-            del self.__internal_state[source_id]
-            for ws in self.__connections[source_id]:
-                try:
-                    await ws.send_json({'source_id': source_id, 'detail': 'Stream ended!'})
-                    await ws.close()
-                except WebSocketDisconnect:
-                    # We will delete all source's connections regardless
-                    pass
-                except RuntimeError:
-                    # Socket already disconnected from client
-                    pass
+            del self.__stream_states[source_id]
+            self.__broadcast(source_id, ({'source_id': source_id, 'detail': 'Stream ended!'},))
+            self.__broadcast(source_id, None)
             del self.__connections[source_id]
 
-    async def __rest(self):
-        await asyncio.sleep(1)
-
-    def __update_fps_info(self, source_id: int, qsize_min: int = 50):
-        self.__internal_state[source_id]['last_sent_time'] = time.time()
-        self.__internal_state[source_id]['num_sent'] += 1
-        qsize = self.__internal_state[source_id]['q'].qsize()
-        if self.__internal_state[source_id]['num_sent'] >= self.__internal_state[source_id]['source_fps']:
-            cur_time = time.time()
-            # Time taken to send source_fps number of frames
-            time_taken = cur_time - self.__internal_state[source_id]['last_fps_measure_time']
-            actual_fps = self.__internal_state[source_id]['source_fps'] / time_taken
-            # print(
-            #     f'Actual FPS: {actual_fps}, time_taken: {time_taken}, set_fps: {self.__internal_state[source_id]["set_fps"]}')
-            if actual_fps < self.__internal_state[source_id]['source_fps']:
-                # print(f'Made FPS Larger...........')
-                self.__internal_state[source_id]['set_fps'] += 0.1
-                self.__internal_state[source_id]['wait_time'] = 1 / (self.__internal_state[source_id]['set_fps'])
-            elif (actual_fps > self.__internal_state[source_id]['source_fps'] or
-                  qsize < qsize_min):
-                # print(f'Made FPS Smaller...........')
-                self.__internal_state[source_id]['set_fps'] -= 0.1
-                self.__internal_state[source_id]['wait_time'] = 1 / (self.__internal_state[source_id]['set_fps'])
-            # print(f"Internal q: {self.__internal_state[source_id]['q'].qsize()}")
-            self.__internal_state[source_id]['num_sent'] = 0
-            self.__internal_state[source_id]['actual_fps'] = actual_fps
-            self.__internal_state[source_id]['last_fps_measure_time'] = cur_time
-
-    def __handle_video_cache(self, source_id: int, frame: np.ndarray):
-        current_cache_size = len(self.__internal_state[source_id]['video_cache'])
-        if current_cache_size >= self.__internal_state[source_id]['video_cache_num_frames']:
-            # TODO: probably not efficient, use dequeue
-            self.__internal_state[source_id]['video_cache'] = self.__internal_state[source_id]['video_cache'][1:]
-        self.__internal_state[source_id]['video_cache'].append(frame)
-
-    async def __handle_accident(self, source_id: int, scores: np.ndarray, enc_frame: np.ndarray):
+    async def __handle_accident(self, state: SourceStreamState, scores: Dict[str, np.ndarray], frame: np.ndarray):
+        """
+        scores: accident type -> scores of the clip, one entry per head run by the ML workers.
+        """
         self.__temp_update_alarm_threshold()
-        if self.__check_accident(source_id=source_id, scores=scores):
-            print('ACCIDENT, ', source_id)
-            await self.__save_accident(source_id=source_id, enc_frame=enc_frame, scores=scores)
-
-    async def __save_accident(self, source_id: int, enc_frame: np.ndarray, scores: np.ndarray):
-        # Save image
+        saved = False
+        for accident_type, type_scores in scores.items():
+            accident_type = AccidentType(accident_type)
+            if self.__check_accident(state=state, accident_type=accident_type, scores=type_scores):
+                print('ACCIDENT, ', accident_type, state.source_id)
+                await self.__save_accident(state=state, accident_type=accident_type, frame=frame,
+                                           scores=type_scores)
+                saved = True
+        if saved:
+            # Cleared only after all detected types have saved the cached frames
+            state.video_cache.clear()
+
+    async def __save_accident(self, state: SourceStreamState, accident_type: AccidentType, frame: np.ndarray,
+                              scores: np.ndarray):
+        # Save image, encoded here, as the frame may not have been encoded for streaming
         image_path = generate_file_path(ext='.jpg')
-        img = cv2.imdecode(np.frombuffer(enc_frame, dtype=np.uint8), cv2.IMREAD_COLOR)
-        cv2.imwrite(image_path, img)
+        cv2.imwrite(image_path, frame)
 
-        # Save video
+        # Save video. Cached frames are at preview resolution, which may differ from the source resolution.
         video_path = generate_file_path(ext='.mp4')
-        fps, h, w = (self.__internal_state[source_id]['source_fps'], self.__internal_state[source_id]['source_h'],
-                     self.__internal_state[source_id]['source_w'])
+        fps = state.source_fps
+        h, w = state.video_cache[-1].shape[:2]
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         out = cv2.VideoWriter(video_path, fourcc, int(fps), (int(w), int(h)))
-        for frame in self.__internal_state[source_id]['video_cache']:
+        for frame in state.video_cache:
             out.write(frame)
 
         out.release()
-        self.__internal_state[source_id]['video_cache'] = []
 
-        accident = Accident(type=AccidentType.CAR_CRASH, image_path=image_path,
-                            source_id=source_id, video_path=video_path, created_at=datetime.utcnow(),
+        accident = Accident(type=accident_type, image_path=image_path,
+                            source_id=state.source_id, video_path=video_path, created_at=datetime.utcnow(),
                             score=list(scores)[self.__accident_class_id])
 
         accident_id = self.__temp_add_accident(accident=accident)
         asyncio.create_task(self.__inform_about_accident(accident_id=accident_id))
 
-    def __check_accident(self, source_id: int, scores: np.ndarray) -> bool:
+    def __check_accident(self, state: SourceStreamState, accident_type: AccidentType, scores: np.ndarray) -> bool:
         ts = time.time()
-        if ((self.__internal_state[source_id]['last_alarm_time'] is not None and
-             ts - self.__internal_state[source_id]['last_alarm_time'] < self.__alarm_timeout) or
-                scores[0] < self.__alarm_score_thr):
+        last_alarm_time = state.last_alarm_time.get(accident_type)
+        if ((last_alarm_time is not None and ts - last_alarm_time < self.__alarm_timeout) or
+                scores[self.__accident_class_id] < self.__alarm_score_thrs[accident_type]):
             return False
 
-        self.__internal_state[source_id]['last_alarm_time'] = ts
+        state.last_alarm_time[accident_type] = ts
         return True
 
-    def __frame_ready_for_stream(self, source_id: int):
-        return (
-                self.__internal_state[source_id]['ready'] and
-                time.time() - self.__internal_state[source_id]['last_sent_time'] >= self.__internal_state[source_id][
-                    'wait_time']
-        )
-
-    def __set_internal_q_buffer_ready(self, source_id):
-        if self.__internal_state[source_id]['ready']:
-            return
-        if self.__internal_state[source_id]['q'].qsize() >= self.__frames_buffer_size:
-            print(f'Buffered frames for source {source_id}, will start streaming!')
-            self.__internal_state[source_id]['ready'] = True
-
     async def terminate_live_stream(self, db: Session, source_id: int):
         db_source = self.__get_source_by_id(db, source_id)
         if db_source is None:
@@ -358,12 +469,16 @@ class SourceService:
         return {'detail': f'Stream terminated for source (id={source_id})!'}
 
     def __put_processed_frames_to_queue(self, data):
-        try:
-            # print(f'Current frames queue size {self.__frames_queue.qsize()}')
+        # Called from the ML workers' postprocessing threads, which must not stall on a slow consumer.
+        # End of stream markers are never dropped.
+        success = data[-1]
+        if not success:
             self.__frames_queue.put(data, block=True)
-        except queue.Full:
-            print(f'frames_queue is full! Element not added.')
             return
+        try:
+            self.__frames_queue.put(data, block=False)
+        except queue.Full:
+            self.__counters.increment('service.dropped_queue_full')
 
     @staticmethod
     def get_file_size(file: UploadFile) -> int:
@@ -438,6 +553,11 @@ class SourceService:
 
         return result
 
+    def get_pipeline_stats(self):
+        return {**self.__worker_stream_reader.counters.snapshot(),
+                **self.__worker_ml_inference_pool.get_counters(),
+                **self.__counters.snapshot()}
+
     def get_live_sources(self, db: Session):
         return db.query(Source).filter(Source.status == SourceStatus.PROCESSING and
                                        Source.id not in self.__sources_to_terminate).all()
@@ -453,8 +573,9 @@ class SourceService:
     def __temp_update_alarm_threshold(self):
         if self.__thr_update_counter % 100 == 0:
             db_temp = SessionLocal()
-            thr_cur = db_temp.query(Threshold).first().car_crash_threshold
-            self.__alarm_score_thr = thr_cur
+            threshold = db_temp.query(Threshold).first()
+            self.__alarm_score_thrs = {accident_type: threshold.get_for(accident_type)
+                                       for accident_type in AccidentType}
             self.__thr_update_counter = 0
             db_temp.close()
         self.__thr_update_counter += 1
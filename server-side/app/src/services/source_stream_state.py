@@ -0,0 +1,68 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple, Any
+
+import numpy as np
+from fastapi import WebSocket
+
+from ..models.enums import AccidentType, StreamProtocol
+from ..utilities import SharedCounters
+
+
+class SourceStreamState:
+    """
+    Streaming state of a live source, owned by the event loop.
+    """
+    __slots__ = ('source_id', 'frames', 'buffered', 'task', 'time_offset', 'last_alarm_time',
+                 'source_fps', 'source_h', 'source_w', 'video_cache', 'seq', 'latest_frame', 'latest_messages')
+
+    def __init__(self, source_id: int, source_fps: float, source_h: int, source_w: int,
+                 video_cache_num_frames: int, max_buffered_frames: int) -> None:
+        self.source_id = source_id
+        # Processed frames waiting for their presentation time
+        self.frames: asyncio.Queue = asyncio.Queue(maxsize=max_buffered_frames)
+        # Set once enough frames are buffered to start streaming, or the stream has ended
+        self.buffered = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        # Event loop time minus capture time of presented frames
+        self.time_offset: Optional[float] = None
+        self.last_alarm_time: Dict[AccidentType, float] = {}
+        self.source_fps = source_fps
+        self.source_h = source_h
+        self.source_w = source_w
+        self.video_cache: Deque[np.ndarray] = deque(maxlen=max(1, int(video_cache_num_frames)))
+        # Number of streamed frames, including the ones not encoded for preview
+        self.seq = 0
+        # (enc_frame, scores, timestamp, seq) of the last encoded frame, sent to clients joining later right away
+        self.latest_frame: Optional[Tuple[bytes, Dict[str, np.ndarray], float, int]] = None
+        # Messages of latest_frame, built once for each protocol in use
+        self.latest_messages: Dict[StreamProtocol, Tuple[Any, ...]] = {}
+
+
+class StreamClient:
+    """
+    A websocket watching a live source. Its messages are sent by its own task, so a slow client only delays
+    itself. Only the latest messages are kept, older ones are dropped once the queue is full and counted as
+    service.dropped_slow_client.
+    """
+    __slots__ = ('websocket', 'protocol', 'messages', 'task', 'counters')
+
+    def __init__(self, websocket: WebSocket, protocol: StreamProtocol, max_messages: int,
+                 counters: SharedCounters) -> None:
+        self.websocket = websocket
+        self.protocol = protocol
+        self.counters = counters
+        # A message is a tuple of bytes and JSON parts, None closes the websocket
+        self.messages: asyncio.Queue = asyncio.Queue(maxsize=max_messages)
+        self.task: Optional[asyncio.Task] = None
+
+    def put_latest(self, message: Optional[Tuple[Any, ...]]) -> bool:
+        """
+        Returns False if the oldest waiting message had to be dropped.
+        """
+        dropped = self.messages.full()
+        if dropped:
+            self.messages.get_nowait()
+            self.counters.increment('service.dropped_slow_client')
+        self.messages.put_nowait(message)
+        return not dropped
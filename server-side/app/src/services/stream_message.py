@@ -0,0 +1,48 @@
+import struct
+from typing import Dict, NamedTuple
+
+import numpy as np
+
+from ..models.enums import AccidentType
+
+PROTOCOL_VERSION = 1
+# Little endian: protocol version, source id, sequence number, capture timestamp (unix seconds),
+# number of accident types, number of scores per accident type
+FRAME_HEADER = struct.Struct('<BIIdBB')
+# Accident types are sent as indices into this tuple, one byte each, following the header
+ACCIDENT_TYPES = tuple(AccidentType)
+
+
+class FrameMessage(NamedTuple):
+    source_id: int
+    seq: int
+    timestamp: float
+    scores: Dict[str, np.ndarray]
+    enc_frame: bytes
+
+
+def pack_frame_message(source_id: int, seq: int, timestamp: float, scores: Dict[str, np.ndarray],
+                       enc_frame: bytes) -> bytes:
+    """
+    A frame of the binary stream protocol: header, accident type indices, float32 scores of each accident type
+    in the same order, then the JPEG encoded frame.
+    """
+    type_indices = bytes(ACCIDENT_TYPES.index(AccidentType(accident_type)) for accident_type in scores)
+    values = np.stack([np.asarray(type_scores, dtype='<f4').ravel() for type_scores in scores.values()])
+    header = FRAME_HEADER.pack(PROTOCOL_VERSION, source_id, seq & 0xFFFFFFFF, timestamp, *values.shape)
+    return b''.join((header, type_indices, values.tobytes(), enc_frame))
+
+
+def unpack_frame_message(message: bytes) -> FrameMessage:
+    version, source_id, seq, timestamp, num_types, num_scores = FRAME_HEADER.unpack_from(message)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f'Unsupported stream protocol version {version}')
+    offset = FRAME_HEADER.size
+    type_indices = message[offset:offset + num_types]
+    offset += num_types
+    values = np.frombuffer(message, dtype='<f4', count=num_types * num_scores, offset=offset)
+    offset += values.nbytes
+    scores = {ACCIDENT_TYPES[i].value: type_scores
+              for i, type_scores in zip(type_indices, values.reshape(num_types, num_scores))}
+    return FrameMessage(source_id=source_id, seq=seq, timestamp=timestamp, scores=scores,
+                        enc_frame=message[offset:])
@@ -11,3 +11,42 @@ EMAIL_SECRET = os.getenv('EMAIL_SECRET')
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES'))
+FRAME_RING_SLOTS = int(os.getenv('FRAME_RING_SLOTS', 64))
+# Seconds an ended source waits for the ML workers to read its remaining frames before its ring is released
+FRAME_RING_RELEASE_TIMEOUT = float(os.getenv('FRAME_RING_RELEASE_TIMEOUT', 10))
+# Frames wider than this are downscaled in the reader, accident clips are recorded at this resolution too.
+# 0 keeps full resolution.
+PREVIEW_MAX_WIDTH = int(os.getenv('PREVIEW_MAX_WIDTH', 640))
+PREVIEW_MAX_FPS = float(os.getenv('PREVIEW_MAX_FPS', 30))
+VIDEO_MAX_SPEED = os.getenv('VIDEO_MAX_SPEED', 'false').lower() == 'true'
+FRAME_ADMISSION_POLICY = os.getenv('FRAME_ADMISSION_POLICY', 'DROP_OLDEST')
+FRAME_ADMISSION_QUOTA = int(os.getenv('FRAME_ADMISSION_QUOTA', 16))
+ML_MAX_CLIPS_PER_BATCH = int(os.getenv('ML_MAX_CLIPS_PER_BATCH', 8))
+ML_MAX_BATCH_WAIT = float(os.getenv('ML_MAX_BATCH_WAIT', 0.05))
+ML_WINDOW_STRIDE = int(os.getenv('ML_WINDOW_STRIDE', 30))
+ML_PIPELINE_DEPTH = int(os.getenv('ML_PIPELINE_DEPTH', 2))
+ML_NUM_WORKERS = int(os.getenv('ML_NUM_WORKERS', 1))
+# Comma separated onnxruntime execution providers in order of preference, CPU is always the fallback
+ML_EXTRACTOR_PROVIDERS = os.getenv('ML_EXTRACTOR_PROVIDERS', 'CUDAExecutionProvider,CPUExecutionProvider')
+ML_TRANSFORMER_PROVIDERS = os.getenv('ML_TRANSFORMER_PROVIDERS', 'CPUExecutionProvider')
+# 0 shares the CPU cores equally between ML workers
+ML_EXTRACTOR_INTRA_OP_THREADS = int(os.getenv('ML_EXTRACTOR_INTRA_OP_THREADS', 0))
+ML_TRANSFORMER_INTRA_OP_THREADS = int(os.getenv('ML_TRANSFORMER_INTRA_OP_THREADS', 0))
+ML_INTER_OP_THREADS = int(os.getenv('ML_INTER_OP_THREADS', 0))
+ML_EXECUTION_MODE = os.getenv('ML_EXECUTION_MODE', 'sequential')
+ML_GRAPH_OPTIMIZATION_LEVEL = os.getenv('ML_GRAPH_OPTIMIZATION_LEVEL', 'all')
+ML_EXTRACTOR_THREAD_AFFINITY = os.getenv('ML_EXTRACTOR_THREAD_AFFINITY', '')
+ML_TRANSFORMER_THREAD_AFFINITY = os.getenv('ML_TRANSFORMER_THREAD_AFFINITY', '')
+# Model variant to run, see ml/model_registry.py: fp32, int8_dynamic or int8_static
+ML_MODEL_VARIANT = os.getenv('ML_MODEL_VARIANT', 'fp32')
+# .npz parameters of the screening head run before the transformer, empty disables the cascade
+ML_CASCADE_HEAD_PATH = os.getenv('ML_CASCADE_HEAD_PATH', '')
+ML_CASCADE_THRESHOLD = float(os.getenv('ML_CASCADE_THRESHOLD', 0.1))
+# Comma separated <accident type>:<ONNX model path> heads scored on the transformer's feature windows,
+# e.g. FIRE:app/src/ml/models/fire_head.onnx. CAR_CRASH is always scored by the transformer, WorkerMLInference
+# raises a ValueError when it is created if it is configured as a head.
+ML_HEADS = dict(head.split(':', 1) for head in os.getenv('ML_HEADS', '').split(',') if head)
+# Optimized ONNX graphs are cached here between starts, empty disables the cache
+ML_MODEL_CACHE_DIR = os.getenv('ML_MODEL_CACHE_DIR', 'app/src/ml/models/optimized')
+# Seconds to wait for the ML workers to become ready when a source is started
+ML_READY_TIMEOUT = float(os.getenv('ML_READY_TIMEOUT', 30))
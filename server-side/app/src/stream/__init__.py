@@ -1 +1,3 @@
+from .frame_ring_buffer import FrameRingBuffer, FrameDescriptor
+from .source_command import SourceCommand, SourceCommandType
 from .worker_stream_reader import WorkerStreamReader
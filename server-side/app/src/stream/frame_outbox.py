@@ -0,0 +1,82 @@
+import queue
+import threading
+from collections import deque
+from typing import Deque, Dict, List
+
+from ..utilities import SharedCounters
+
+
+class FrameOutbox:
+    """
+    Published frames of each source wait in their own queue and a single thread forwards them to on_done
+    round-robin, one frame per source and turn, so a fast source cannot crowd out the frames of the others.
+    on_done raises queue.Full if it cannot take a frame right now, the frame is kept and retried in a later
+    turn. Frames beyond the limit given with a new frame are dropped, oldest first, and counted as
+    reader.dropped_oldest. End of stream markers are never dropped.
+    """
+
+    def __init__(self, on_done: callable, counters: SharedCounters) -> None:
+        self.on_done = on_done
+        self.counters = counters
+        self.__frames: Dict[int, Deque] = {}
+        # Source ids in the order of their next turn
+        self.__turns: Deque[int] = deque()
+        self.__condition = threading.Condition()
+        # Wait before the next round, if on_done took no frame in the last one
+        self.__retry_interval = 0.005
+        self.__stopped = False
+        self.__thread = threading.Thread(target=self.__do_work, name='THREAD_frame_outbox', daemon=True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        with self.__condition:
+            self.__stopped = True
+            self.__condition.notify()
+
+    def put(self, data, limit: int) -> None:
+        source_id, _, success = data
+        with self.__condition:
+            frames = self.__frames.get(source_id)
+            if frames is None:
+                frames = self.__frames[source_id] = deque()
+                self.__turns.append(source_id)
+            # The marker of a source's previous run may still wait, it is never dropped
+            while success and len(frames) >= max(1, limit) and frames[0][2]:
+                frames.popleft()
+                self.counters.increment('reader.dropped_oldest')
+            frames.append(data)
+            self.__condition.notify()
+
+    def __do_work(self) -> None:
+        while 1:
+            with self.__condition:
+                while len(self.__turns) == 0 and not self.__stopped:
+                    self.__condition.wait()
+                if self.__stopped:
+                    return
+                turns: List[int] = list(self.__turns)
+            forwarded = [self.__forward(source_id) for source_id in turns]
+            if not any(forwarded):
+                with self.__condition:
+                    self.__condition.wait(self.__retry_interval)
+
+    def __forward(self, source_id: int) -> bool:
+        with self.__condition:
+            frames = self.__frames[source_id]
+            data = frames.popleft()
+        forwarded = True
+        try:
+            # Outside of the lock, on_done may block, e.g. on an end of stream marker
+            self.on_done(data)
+        except queue.Full:
+            forwarded = False
+        with self.__condition:
+            if not forwarded:
+                # Back to the front, the next new frame drops it if the source is over its limit meanwhile
+                frames.appendleft(data)
+            if len(frames) == 0:
+                del self.__frames[source_id]
+                self.__turns.remove(source_id)
+        return forwarded
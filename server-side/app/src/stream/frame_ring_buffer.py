@@ -0,0 +1,130 @@
+import uuid
+from multiprocessing import shared_memory, resource_tracker
+from typing import NamedTuple, Optional, Tuple, Dict, Sequence
+
+import numpy as np
+
+
+class FrameDescriptor(NamedTuple):
+    source_id: int
+    slot: int
+    seq: int
+    timestamp: float
+    ring_name: str
+    plane_shapes: Tuple[Tuple[str, Tuple[int, ...]], ...]
+    num_slots: int
+    # Planes written for this frame
+    planes: Tuple[str, ...]
+
+
+class FrameRingBuffer:
+    """
+    Fixed number of frame slots in shared memory, written by a single producer process.
+    Each slot holds one or more named planes (e.g. model input tile and preview frame) of the same frame.
+    Only small FrameDescriptor tuples cross the process boundary, the consumer attaches to the
+    ring by name and copies the planes out of the referenced slot. The producer never waits for
+    the consumer: the oldest slot is overwritten, which the consumer detects via slot sequence numbers.
+    """
+
+    # Header: [write_seq, read_seq], followed by one sequence number per slot
+    __HEADER_SIZE = 2
+    __ALIGNMENT = 64
+
+    def __init__(self, shm: shared_memory.SharedMemory, plane_shapes: Dict[str, Tuple[int, ...]],
+                 num_slots: int, owner: bool) -> None:
+        self.__shm = shm
+        self.__owner = owner
+        self.plane_shapes = {name: tuple(shape) for name, shape in plane_shapes.items()}
+        self.num_slots = num_slots
+        self.__header = np.ndarray((self.__HEADER_SIZE + num_slots,), dtype=np.int64, buffer=shm.buf)
+        self.__slot_seqs = self.__header[self.__HEADER_SIZE:]
+        self.__planes: Dict[str, np.ndarray] = {}
+        offset = self.__header.nbytes
+        for name, shape in self.plane_shapes.items():
+            offset = self.__align(offset)
+            self.__planes[name] = np.ndarray((num_slots, *shape), dtype=np.uint8, buffer=shm.buf, offset=offset)
+            offset += self.__planes[name].nbytes
+
+    @property
+    def name(self) -> str:
+        return self.__shm.name
+
+    @classmethod
+    def create(cls, source_id: int, plane_shapes: Dict[str, Tuple[int, ...]], num_slots: int) -> 'FrameRingBuffer':
+        size = (cls.__HEADER_SIZE + num_slots) * np.dtype(np.int64).itemsize
+        for shape in plane_shapes.values():
+            size = cls.__align(size) + num_slots * int(np.prod(shape))
+        shm = shared_memory.SharedMemory(name=f'frame_ring_{source_id}_{uuid.uuid4().hex[:8]}',
+                                         create=True, size=size)
+        ring = cls(shm=shm, plane_shapes=plane_shapes, num_slots=num_slots, owner=True)
+        ring.__header[:cls.__HEADER_SIZE] = 0
+        ring.__slot_seqs[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, descriptor: FrameDescriptor) -> 'FrameRingBuffer':
+        shm = shared_memory.SharedMemory(name=descriptor.ring_name)
+        # The producer owns the segment, do not let this process' resource tracker unlink it on exit
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm=shm, plane_shapes=dict(descriptor.plane_shapes), num_slots=descriptor.num_slots, owner=False)
+
+    def write(self, source_id: int, planes: Dict[str, np.ndarray], timestamp: float) -> FrameDescriptor:
+        """
+        Only the provided planes are written, e.g. a frame which will not be inferred on has no model plane.
+        """
+        seq = int(self.__header[0])
+        slot = seq % self.num_slots
+        # Invalidate the slot while it is being rewritten, so that a concurrent reader discards it
+        self.__slot_seqs[slot] = -1
+        for name, data in planes.items():
+            np.copyto(self.__planes[name][slot], data)
+        self.__slot_seqs[slot] = seq
+        self.__header[0] = seq + 1
+        return FrameDescriptor(source_id=source_id, slot=slot, seq=seq, timestamp=timestamp,
+                               ring_name=self.name, plane_shapes=tuple(self.plane_shapes.items()),
+                               num_slots=self.num_slots, planes=tuple(planes.keys()))
+
+    def read(self, descriptor: FrameDescriptor,
+             plane_names: Optional[Sequence[str]] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Returns copies of the described frame planes (all written ones by default) or None,
+        if the slot has already been recycled by the producer.
+        """
+        slot = descriptor.slot
+        if self.__slot_seqs[slot] != descriptor.seq:
+            return None
+        if plane_names is None:
+            plane_names = descriptor.planes
+        planes = {name: self.__planes[name][slot].copy() for name in plane_names}
+        if self.__slot_seqs[slot] != descriptor.seq:
+            # Overwritten while copying
+            return None
+        self.__header[1] = descriptor.seq + 1
+        return planes
+
+    def skip(self, descriptor: FrameDescriptor) -> None:
+        """
+        Marks the described frame as read without copying it, i.e. drops it.
+        """
+        self.__header[1] = descriptor.seq + 1
+
+    def pending(self) -> int:
+        """
+        Number of frames written, but not yet read by the consumer.
+        """
+        return int(self.__header[0] - self.__header[1])
+
+    def close(self) -> None:
+        if self.__shm is None:
+            return
+        # Views into the buffer must be released before the segment can be closed
+        self.__header = self.__slot_seqs = None
+        self.__planes = {}
+        self.__shm.close()
+        if self.__owner:
+            self.__shm.unlink()
+        self.__shm = None
+
+    @classmethod
+    def __align(cls, offset: int) -> int:
+        return (offset + cls.__ALIGNMENT - 1) // cls.__ALIGNMENT * cls.__ALIGNMENT
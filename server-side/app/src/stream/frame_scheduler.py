@@ -0,0 +1,74 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import List, Tuple
+
+
+class FrameScheduler:
+    """
+    Releases decoded frames of all sources at their presentation deadlines.
+    Deadlines are kept in a min-heap and a single thread sleeps exactly until the earliest one,
+    instead of every source re-checking the clock in a loop.
+    Deadlines are expressed in time.monotonic() seconds.
+    """
+
+    def __init__(self) -> None:
+        self.__heap: List[Tuple[float, int, threading.Event]] = []
+        self.__condition = threading.Condition()
+        # Tie-breaker, so that events with equal deadlines are never compared
+        self.__counter = itertools.count()
+        self.__stopped = False
+        self.__thread = threading.Thread(target=self.__do_work, name='THREAD_frame_scheduler', daemon=True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def schedule(self, deadline: float, release: threading.Event) -> None:
+        """
+        Sets the release event once the deadline has been reached, right away if the scheduler is stopped.
+        """
+        with self.__condition:
+            if self.__stopped:
+                release.set()
+                return
+            heapq.heappush(self.__heap, (deadline, next(self.__counter), release))
+            if self.__heap[0][2] is release:
+                # New earliest deadline, wake up the scheduler thread to shorten its sleep
+                self.__condition.notify()
+
+    def cancel(self, release: threading.Event) -> None:
+        """
+        Removes the pending deadlines of the release event without setting it.
+        """
+        with self.__condition:
+            self.__heap = [entry for entry in self.__heap if entry[2] is not release]
+            heapq.heapify(self.__heap)
+            self.__condition.notify()
+
+    def stop(self) -> None:
+        """
+        Stops the scheduler thread, all pending release events are set right away.
+        """
+        with self.__condition:
+            self.__stopped = True
+            pending = [release for _, _, release in self.__heap]
+            self.__heap = []
+            self.__condition.notify()
+        for release in pending:
+            release.set()
+
+    def __do_work(self) -> None:
+        while 1:
+            with self.__condition:
+                while len(self.__heap) == 0 and not self.__stopped:
+                    self.__condition.wait()
+                if self.__stopped:
+                    return
+                deadline = self.__heap[0][0]
+                time_left = deadline - time.monotonic()
+                if time_left > 0:
+                    self.__condition.wait(time_left)
+                    continue
+                _, _, release = heapq.heappop(self.__heap)
+            release.set()
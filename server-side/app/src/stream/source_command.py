@@ -0,0 +1,18 @@
+from enum import Enum
+from typing import NamedTuple, Any
+
+
+class SourceCommandType(str, Enum):
+    ADD = "ADD"
+    REMOVE = "REMOVE"
+    PAUSE = "PAUSE"
+    RESUME = "RESUME"
+    UPDATE_PARAMS = "UPDATE_PARAMS"
+    # Posted by a decoder of the reader process itself, once it has exited
+    FINISHED = "FINISHED"
+
+
+class SourceCommand(NamedTuple):
+    type: SourceCommandType
+    source_id: int
+    payload: Any = None
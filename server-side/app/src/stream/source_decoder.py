@@ -0,0 +1,259 @@
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Any, Tuple, Optional
+
+import cv2
+
+from .frame_ring_buffer import FrameRingBuffer, FrameDescriptor
+from .frame_scheduler import FrameScheduler
+from ..utilities import SharedCounters
+
+
+class SourceDecoder:
+    """
+    Decodes a single source in its own thread, so that a slow or stalled source does not delay the others.
+    Each decoded frame is held until the scheduler releases it at its presentation time (derived from the
+    capture timestamps, or FPS if these are unavailable) and is then written to the source's ring buffer
+    and its descriptor is passed to on_done. In max speed mode frames are not paced, instead the decoder
+    waits only while the consumer has not read the whole ring yet, so no frame is lost.
+    Live sources that fall behind real time, or whose consumer has fallen behind, catch up by grabbing
+    frames without decoding them until they are back on schedule.
+    Only every inference_stride-th published frame gets a model input tile, the rest are preview only.
+    Paced sources with more than admission_quota unread frames in the ring are handled by their admission
+    policy: DROP_NEWEST skips decoding new frames, DEGRADE publishes them without a model input tile and
+    DROP_OLDEST publishes them as usual, the oldest unread ones are dropped by the reader's FrameOutbox and
+    the consumer instead.
+    End of the source, whether it finished or was stopped, is signalled with exactly one (source_id, None, False).
+    """
+
+    def __init__(self,
+                 source_id: int,
+                 source_str: str,
+                 on_done: callable,
+                 on_finished: callable,
+                 scheduler: FrameScheduler,
+                 max_speed: bool,
+                 live: bool,
+                 inference_stride: int,
+                 ring_slots: int,
+                 model_input_size: Tuple[int, int],
+                 preview_max_width: int,
+                 admission_policy: str,
+                 admission_quota: int,
+                 counters: SharedCounters,
+                 release_timeout: float = 10.0) -> None:
+        self.source_id = source_id
+        self.source_str = source_str
+        self.on_done = on_done
+        self.on_finished = on_finished
+        self.scheduler = scheduler
+        self.max_speed = max_speed
+        self.live = live
+        self.inference_stride = max(1, inference_stride)
+        self.ring_slots = ring_slots
+        self.model_input_size = model_input_size
+        self.preview_max_width = preview_max_width
+        self.admission_policy = admission_policy
+        self.admission_quota = admission_quota
+        self.counters = counters
+        self.fps = 0.0
+        self.__cap = None
+        self.__ring: Optional[FrameRingBuffer] = None
+        self.__preview_size: Optional[Tuple[int, int]] = None
+        # Presentation time (time.monotonic) and capture position (seconds) of the last frame
+        self.__deadline: Optional[float] = None
+        self.__position: Optional[float] = None
+        # When lagging more than this, pacing restarts from the current time instead of catching up
+        self.__max_lag = 1.0
+        # Live sources lagging more than this, or with more than half of the ring unread, skip decoding
+        self.__catch_up_lag = 0.5
+        # A live source's grab blocking at least this long means its backlog is drained, set once FPS is known
+        self.__drained_grab_time = 0.01
+        self.__num_skipped = 0
+        self.__num_published = 0
+        self.__consumer_poll_interval = 0.005
+        # Longest wait for the consumer to read the remaining frames before the ring is released
+        self.release_timeout = release_timeout
+        self.__release = threading.Event()
+        self.__resumed = threading.Event()
+        self.__resumed.set()
+        self.__stop_event = threading.Event()
+        self.__finished = threading.Event()
+        self.__thread = threading.Thread(target=self.__do_work, name=f'THREAD_decoder_{source_id}', daemon=True)
+
+    @property
+    def finished(self) -> bool:
+        return self.__finished.is_set()
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Does not wait for the thread, a blocking read of a stalled stream must not delay the caller.
+        """
+        self.__stop_event.set()
+        self.scheduler.cancel(self.__release)
+        self.__release.set()
+        self.__resumed.set()
+
+    def pause(self) -> None:
+        self.__resumed.clear()
+
+    def resume(self) -> None:
+        # Pacing restarts from the current time
+        self.__deadline = None
+        self.__resumed.set()
+
+    def update_params(self, max_speed: bool = None, inference_stride: int = None) -> None:
+        if max_speed is not None:
+            self.max_speed = max_speed
+        if inference_stride is not None:
+            self.inference_stride = max(1, inference_stride)
+
+    def __do_work(self) -> None:
+        try:
+            # Opening a network stream may block for a while, therefore it is done in the decoder thread
+            self.__cap = cv2.VideoCapture(self.source_str)
+            self.fps = self.__cap.get(cv2.CAP_PROP_FPS)
+            print(f'READER, added {self.source_id}, FPS: {self.fps}')
+            if self.fps > 0:
+                self.__drained_grab_time = 0.5 / self.fps
+            while not self.__stop_event.is_set():
+                self.__resumed.wait()
+                grab_started = time.monotonic()
+                if not self.__cap.grab():
+                    break
+                if self.live and time.monotonic() - grab_started >= self.__drained_grab_time:
+                    # Waited for the frame to arrive, i.e. there is nothing left to catch up on. Pacing restarts
+                    # from now, otherwise a lag left over from a stall would skip all following frames.
+                    self.__deadline = None
+                # Read once, update_params may change it while the frame is processed
+                max_speed = self.max_speed
+                deadline = None if max_speed else self.__next_deadline()
+                if self.live and self.__is_behind(deadline):
+                    self.__num_skipped += 1
+                    continue
+                self.__report_caught_up()
+                over_quota = self.__is_over_quota(max_speed)
+                if over_quota and self.admission_policy == 'DROP_NEWEST':
+                    # Dropped frames keep their place in time, otherwise the source would run ahead of its schedule
+                    self.__wait_for_deadline(deadline)
+                    self.counters.increment('reader.dropped_newest')
+                    continue
+                success, frame = self.__cap.retrieve()
+                if not success:
+                    break
+                if max_speed:
+                    self.__wait_for_consumer()
+                else:
+                    self.__wait_for_deadline(deadline)
+                if self.__stop_event.is_set():
+                    break
+                degrade = over_quota and self.admission_policy == 'DEGRADE'
+                if degrade:
+                    self.counters.increment('reader.degraded')
+                self.on_done((self.source_id, self.__write_to_ring(frame, degrade), True))
+        except BaseException as e:
+            e_type, e_object, e_traceback = sys.exc_info()
+            print(f'{threading.current_thread().name}\n'
+                  f'Error:{e_type}:{e_object}\n{"".join(traceback.format_tb(e_traceback))}')
+        finally:
+            self.on_done((self.source_id, None, False))
+            self.__release_resources()
+            self.__finished.set()
+            self.on_finished(self.source_id)
+
+    def __is_behind(self, deadline: float) -> bool:
+        return ((deadline is not None and time.monotonic() - deadline > self.__catch_up_lag) or
+                (self.__ring is not None and self.__ring.pending() > self.__ring.num_slots // 2))
+
+    def __is_over_quota(self, max_speed: bool) -> bool:
+        # Sources read at max speed wait for the consumer instead
+        return (not max_speed and self.__ring is not None and
+                self.__ring.pending() >= self.admission_quota)
+
+    def __report_caught_up(self) -> None:
+        if self.__num_skipped > 0:
+            print(f'READER, source {self.source_id} caught up, skipped {self.__num_skipped} frames')
+            self.__num_skipped = 0
+            self.__num_published = 0
+
+    def __wait_for_deadline(self, deadline: float) -> None:
+        if deadline <= time.monotonic():
+            return
+        self.__release.clear()
+        self.scheduler.schedule(deadline=deadline, release=self.__release)
+        self.__release.wait()
+
+    def __next_deadline(self) -> float:
+        now = time.monotonic()
+        position = self.__cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        if self.__deadline is None:
+            deadline = now
+        elif self.__position is not None and position > self.__position:
+            deadline = self.__deadline + (position - self.__position)
+        elif self.fps > 0:
+            deadline = self.__deadline + 1 / self.fps
+        else:
+            deadline = now
+        if not self.live and deadline < now - self.__max_lag:
+            # Live sources catch up by skipping frames instead
+            deadline = now
+        self.__deadline = deadline
+        self.__position = position
+        return deadline
+
+    def __wait_for_consumer(self) -> None:
+        while (self.__ring is not None and
+               self.__ring.pending() >= self.__ring.num_slots and
+               not self.__stop_event.wait(self.__consumer_poll_interval)):
+            pass
+
+    def __write_to_ring(self, frame, degrade: bool = False) -> FrameDescriptor:
+        if self.__ring is None:
+            self.__preview_size = self.__get_preview_size(frame)
+            self.__ring = FrameRingBuffer.create(
+                source_id=self.source_id,
+                plane_shapes={'model': (*self.model_input_size, 3), 'preview': (*self.__preview_size, 3)},
+                num_slots=self.ring_slots)
+        infer = not degrade and self.__num_published % self.inference_stride == 0
+        self.__num_published += 1
+        return self.__ring.write(source_id=self.source_id, planes=self.__get_planes(frame, infer),
+                                 timestamp=time.time())
+
+    def __get_planes(self, frame, infer: bool) -> Dict[str, Any]:
+        planes = {}
+        if infer:
+            model_h, model_w = self.model_input_size
+            planes['model'] = cv2.cvtColor(cv2.resize(frame, (model_w, model_h)), cv2.COLOR_BGR2RGB)
+        preview_h, preview_w = self.__preview_size
+        if frame.shape[:2] != (preview_h, preview_w):
+            frame = cv2.resize(frame, (preview_w, preview_h), interpolation=cv2.INTER_AREA)
+        planes['preview'] = frame
+        return planes
+
+    def __get_preview_size(self, frame) -> Tuple[int, int]:
+        h, w = frame.shape[:2]
+        if self.preview_max_width <= 0 or w <= self.preview_max_width:
+            return h, w
+        return round(h * self.preview_max_width / w), self.preview_max_width
+
+    def __release_resources(self) -> None:
+        if self.__cap is not None:
+            self.__cap.release()
+        if self.__ring is not None:
+            self.__wait_until_read()
+            self.__ring.close()
+
+    def __wait_until_read(self) -> None:
+        """
+        Descriptors still queued for the consumer refer to the ring, which is unlinked once closed.
+        The consumer may not even have attached yet (e.g. short clips), so it is given time to read them.
+        Frames dropped on the way are never read, the wait is bounded.
+        """
+        deadline = time.monotonic() + self.release_timeout
+        while self.__ring.pending() > 0 and time.monotonic() < deadline:
+            time.sleep(self.__consumer_poll_interval)
@@ -5,31 +5,73 @@ import sys
 import time
 import traceback
 from multiprocessing import Process, current_process
-from typing import List, Dict, Any
+from typing import Dict, Tuple
 
-import cv2
+from .frame_outbox import FrameOutbox
+from .frame_scheduler import FrameScheduler
+from .source_command import SourceCommand, SourceCommandType
+from .source_decoder import SourceDecoder
+from ..utilities import SharedCounters
 
 
 class WorkerStreamReader:
+    COUNTERS = ('reader.dropped_newest', 'reader.degraded', 'reader.dropped_oldest')
+
     def __init__(self,
-                 shared_sources_dict: Dict[int, str],
-                 on_done: callable) -> None:
-        self.sources = shared_sources_dict
-        self.sources_lock = multiprocessing.Lock()
-        self.caps: Dict[int, Dict[str, Any]] = {}
+                 on_done: callable,
+                 ring_slots: int = 64,
+                 model_input_size: Tuple[int, int] = (128, 128),
+                 preview_max_width: int = 640,
+                 admission_quota: int = 16,
+                 ring_release_timeout: float = 10.0) -> None:
+        # Source changes are sent to the reader process as commands, it blocks on this queue between them
+        self.commands = multiprocessing.Queue()
+        # Number of sources currently being decoded, maintained by the reader process
+        self.active_sources = multiprocessing.Value('i', 0)
+        self.decoders: Dict[int, SourceDecoder] = {}
+        self.scheduler = None
+        # Forwards the published frames of all sources to on_done in turns, see FrameOutbox
+        self.outbox = None
         self.on_done = on_done
+        self.ring_slots = ring_slots
+        # (height, width) of the RGB tile fed to the feature extractor
+        self.model_input_size = model_input_size
+        # Frames wider than this are downscaled for preview and clip recording, 0 keeps full resolution
+        self.preview_max_width = preview_max_width
+        # Unread frames a source may have in its ring before its admission policy applies
+        self.admission_quota = admission_quota
+        # Seconds an ended source waits for its unread frames to be consumed before its ring is released
+        self.ring_release_timeout = ring_release_timeout
+        self.counters = SharedCounters(self.COUNTERS)
         self.process = None
 
-    def add_source(self, source_id, source_str) -> None:
-        print('trying')
-        with self.sources_lock:
-            self.sources[source_id] = source_str
-        print('done')
+    def add_source(self, source_id, source_str, max_speed: bool = False, live: bool = False,
+                   inference_stride: int = 1, admission_policy: str = 'DROP_OLDEST') -> None:
+        """
+        max_speed: do not pace the source to its FPS, read as fast as inference keeps up (offline video files).
+        live: source is a real time stream, which should skip frames rather than accumulate latency.
+        inference_stride: only every n-th frame is inferred on, all frames are still streamed.
+        admission_policy: AdmissionPolicy value, how frames are shed once admission_quota frames are unread.
+        """
+        self.commands.put(SourceCommand(type=SourceCommandType.ADD, source_id=source_id,
+                                        payload={'source_str': source_str, 'max_speed': max_speed, 'live': live,
+                                                 'inference_stride': inference_stride,
+                                                 'admission_policy': admission_policy}))
 
     def remove_source(self, source_id):
-        with self.sources_lock:
-            if source_id in self.sources.keys():
-                del self.sources[source_id]
+        self.commands.put(SourceCommand(type=SourceCommandType.REMOVE, source_id=source_id))
+
+    def pause_source(self, source_id):
+        self.commands.put(SourceCommand(type=SourceCommandType.PAUSE, source_id=source_id))
+
+    def resume_source(self, source_id):
+        self.commands.put(SourceCommand(type=SourceCommandType.RESUME, source_id=source_id))
+
+    def update_source(self, source_id, **params):
+        self.commands.put(SourceCommand(type=SourceCommandType.UPDATE_PARAMS, source_id=source_id, payload=params))
+
+    def num_sources(self) -> int:
+        return self.active_sources.value
 
     def start(self):
         self.process = Process(target=self.__do_work, name='PROCESS_worker_stream_reader')
@@ -43,88 +85,71 @@ class WorkerStreamReader:
             self.process = None
 
     def __do_work(self) -> None:
+        self.scheduler = FrameScheduler()
+        self.scheduler.start()
+        self.outbox = FrameOutbox(on_done=self.on_done, counters=self.counters)
+        self.outbox.start()
         while 1:
             try:
-                removed_sources = self.__handle_source_changes()
-                self.__inform_about_removed_sources(removed_sources=removed_sources)
-                finished_ids = self.__read_caps()
-                self.__handle_finished_caps(finished_ids=finished_ids)
-                self.__rest()
+                # Nothing to do until a command arrives, decoding happens in the decoder threads
+                command = self.commands.get(block=True)
+                self.__handle_command(command)
+                self.active_sources.value = len(self.decoders)
             except BaseException as e:
                 time.sleep(5)
                 e_type, e_object, e_traceback = sys.exc_info()
                 print(f'{current_process().name}\n'
                       f'Error:{e_type}:{e_object}\n{"".join(traceback.format_tb(e_traceback))}')
 
-    def __rest(self):
-        if len(self.caps) == 0:
-            time.sleep(1)
-
-    def __read_caps(self) -> List[int]:
-        finished_ids = []
-        for (source_id, cap_info) in self.caps.items():
-            if not self.__should_read_cap(source_id): continue
-            self.__update_fps_info(source_id)
-            success, frame = cap_info['cap'].read()
-            if success:
-                self.caps[source_id]['num_read'] += 1
-            else:
-                finished_ids.append(source_id)
-
-            self.on_done((source_id, frame, success))
-
-        return finished_ids
-
-    def __inform_about_removed_sources(self, removed_sources: List[int]) -> None:
-        for source_id in removed_sources:
-            self.on_done((source_id, None, False))
-
-
-    def __update_fps_info(self, source_id):
-        if self.caps[source_id]['num_read'] >= self.caps[source_id]['fps']:
-            self.caps[source_id]['num_read'] = 0
-            self.caps[source_id]['start_time'] = time.time()
-
-    def __should_read_cap(self, source_id) -> bool:
-        num_read = self.caps[source_id]['num_read']
-        fps = self.caps[source_id]['fps']
-        start_time = self.caps[source_id]['start_time']
-        return (
-            num_read < fps or
-            time.time() - start_time >= 1.0
-        )
-
-    def __handle_finished_caps(self, finished_ids: List[int]) -> None:
-        with self.sources_lock:
-            for source_id in finished_ids:
-                self.caps[source_id]['cap'].release()
-                del self.caps[source_id]
-                del self.sources[source_id]
-
-    def __handle_source_changes(self) -> List[int]:
-        removed_sources = []
-        with self.sources_lock:
-            # Handle new sources
-            live_source_ids = self.caps.keys()
-            for source_id, source_str in self.sources.items():
-                if source_id not in live_source_ids:
-                    print(source_str)
-                    video_cap = cv2.VideoCapture(source_str)
-                    self.caps[source_id] = {
-                        'cap': video_cap,
-                        'fps': video_cap.get(cv2.CAP_PROP_FPS),
-                        'start_time': time.time(),
-                        'num_read': 0
-                    }
-                    print(f'READER, added {source_id}, FPS: {self.caps[source_id]["fps"]}')
-
-            # Handle removed sources (stop streaming)
-            expected_source_ids = self.sources.keys()
-            for source_id in list(self.caps.keys()):
-                if source_id not in expected_source_ids:
-                    print(f'READER, removed {source_id}')
-                    removed_sources.append(source_id)
-                    self.caps[source_id]['cap'].release()
-                    del self.caps[source_id]
-
-        return removed_sources
+    def __handle_command(self, command: SourceCommand) -> None:
+        source_id = command.source_id
+        decoder = self.decoders.get(source_id)
+        if command.type == SourceCommandType.ADD:
+            if decoder is not None:
+                print(f'READER, source {source_id} is already being read')
+                return
+            print(command.payload['source_str'])
+            decoder = SourceDecoder(source_id=source_id, source_str=command.payload['source_str'],
+                                    on_done=self.__publish, on_finished=self.__on_decoder_finished,
+                                    scheduler=self.scheduler, max_speed=command.payload['max_speed'],
+                                    live=command.payload['live'],
+                                    inference_stride=command.payload['inference_stride'],
+                                    ring_slots=self.ring_slots, model_input_size=self.model_input_size,
+                                    preview_max_width=self.preview_max_width,
+                                    admission_policy=command.payload['admission_policy'],
+                                    admission_quota=self.admission_quota, counters=self.counters,
+                                    release_timeout=self.ring_release_timeout)
+            # Known before its first frame is published
+            self.decoders[source_id] = decoder
+            decoder.start()
+        elif decoder is None:
+            return
+        elif command.type == SourceCommandType.REMOVE:
+            # Decoder informs about the end of the source itself
+            print(f'READER, removed {source_id}')
+            decoder.stop()
+            del self.decoders[source_id]
+        elif command.type == SourceCommandType.PAUSE:
+            decoder.pause()
+        elif command.type == SourceCommandType.RESUME:
+            decoder.resume()
+        elif command.type == SourceCommandType.UPDATE_PARAMS:
+            decoder.update_params(**command.payload)
+        elif command.type == SourceCommandType.FINISHED:
+            # A removed and re-added source has a new decoder, which must be kept
+            if decoder.finished:
+                del self.decoders[source_id]
+
+    def __publish(self, data) -> None:
+        """
+        Called by the decoder threads. Frames of paced DROP_OLDEST sources wait up to admission_quota at a time,
+        others up to a whole ring, older descriptors would refer to overwritten slots.
+        """
+        decoder = self.decoders.get(data[0])
+        limit = self.ring_slots
+        if decoder is not None and decoder.admission_policy == 'DROP_OLDEST' and not decoder.max_speed:
+            limit = self.admission_quota
+        self.outbox.put(data, limit=limit)
+
+    def __on_decoder_finished(self, source_id: int) -> None:
+        self.commands.put(SourceCommand(type=SourceCommandType.FINISHED, source_id=source_id))
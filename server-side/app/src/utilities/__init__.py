@@ -1,3 +1,4 @@
 from .execution_time import execution_time
 from .file_utils import FileSize, generate_file_path, delete_file, file_exists
+from .shared_counters import SharedCounters
 from .time_utils import get_adjusted_timezone
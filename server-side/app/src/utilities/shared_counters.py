@@ -0,0 +1,28 @@
+import multiprocessing
+from typing import Sequence, Dict
+
+
+class SharedCounters:
+    """
+    Named integer counters, which can be incremented from any process and read from any other.
+    Backed by a shared memory array, so no manager process round trips are involved.
+    Must be created before the worker processes are started.
+    """
+
+    def __init__(self, names: Sequence[str]) -> None:
+        self.__index = {name: i for i, name in enumerate(names)}
+        self.__values = multiprocessing.Array('q', len(names))
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self.__values.get_lock():
+            self.__values[self.__index[name]] += value
+
+    def set(self, name: str, value: int) -> None:
+        """
+        For gauges, e.g. current queue depths.
+        """
+        self.__values[self.__index[name]] = value
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.__values.get_lock():
+            return {name: self.__values[i] for name, i in self.__index.items()}
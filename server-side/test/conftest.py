@@ -1,10 +1,12 @@
-import multiprocessing
 import os
 import queue
 import shutil
+import threading
+import time
 from datetime import datetime
 from multiprocessing import Queue
 
+import cv2
 import pytest
 from dotenv import load_dotenv
 from fastapi.testclient import TestClient
@@ -20,7 +22,10 @@ from app.src.models import Accident, Source, Threshold, Recipient, User
 from app.src.models.enums import AccidentType, SourceStatus
 from app.src.models.enums import SourceType
 from app.src.schemas import UserCreate
-from app.src.stream import WorkerStreamReader
+from app.src.stream import WorkerStreamReader, FrameRingBuffer
+from app.src.stream.frame_scheduler import FrameScheduler
+from app.src.stream.source_decoder import SourceDecoder
+from app.src.utilities import SharedCounters
 from app.src.utilities import delete_file
 
 load_dotenv()
@@ -38,8 +43,6 @@ Base.metadata.create_all(bind=engine)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-manager = multiprocessing.Manager()
-
 @pytest.fixture(scope="function")
 def db_session():
     """Create a new database session with a rollback at the end of the test."""
@@ -261,7 +264,6 @@ def uploaded_stream_source_with_accidents(test_client, db_session, accidents_dat
 @pytest.fixture()
 def mocked_stream_reader():
     output_q = Queue(maxsize=100)
-    shared_sources_dict = manager.dict()
 
     def on_done(data):
         try:
@@ -270,8 +272,8 @@ def mocked_stream_reader():
             print(f'Output queue is full! Element not added.')
             return
 
-    stream_reader = WorkerStreamReader(shared_sources_dict=shared_sources_dict,
-                                       on_done=on_done)
+    # Nothing reads the rings, ended sources should not wait for it
+    stream_reader = WorkerStreamReader(on_done=on_done, ring_release_timeout=0)
 
     stream_reader.start()
     yield output_q, stream_reader
@@ -284,6 +286,36 @@ def video_source_to_read():
     return 1, 'test/static/video1.mp4'
 
 
+@pytest.fixture()
+def source_decoder_factory(video_source_to_read):
+    """
+    Creates decoders of the test video, which append their published data to a list.
+    Returns the decoder, the list and an event set once the decoder has finished.
+    """
+    source_id, source_str = video_source_to_read
+    scheduler = FrameScheduler()
+    scheduler.start()
+    decoders = []
+
+    def create(**params):
+        output = []
+        finished = threading.Event()
+        decoder_params = {'max_speed': False, 'live': False, 'inference_stride': 1, 'ring_slots': 64,
+                          'model_input_size': (128, 128), 'preview_max_width': 640,
+                          'admission_policy': 'DROP_OLDEST', 'admission_quota': 64,
+                          'counters': SharedCounters(WorkerStreamReader.COUNTERS), **params}
+        decoder = SourceDecoder(source_id=source_id, source_str=source_str, on_done=output.append,
+                                on_finished=lambda _: finished.set(), scheduler=scheduler, **decoder_params)
+        decoders.append(decoder)
+        return decoder, output, finished
+
+    yield create
+
+    for decoder in decoders:
+        decoder.stop()
+    scheduler.stop()
+
+
 @pytest.fixture()
 def mocked_ml_inference():
     input_q = Queue(maxsize=100)
@@ -299,6 +331,37 @@ def mocked_ml_inference():
 
     ml = WorkerMLInference(on_done=on_done, batch_size=batch_size)
     ml.start()
+    # Sessions are created and warmed up before the worker takes frames, which may take a while on CPU
+    assert ml.ready.wait(timeout=120), 'ML worker did not get ready!'
     yield batch_size, input_q, output_q, ml
 
     ml.stop()
+
+
+@pytest.fixture()
+def ml_frame_feeder(mocked_ml_inference, video_source_to_read):
+    """
+    Writes the next num_frames frames of the test video to a ring buffer, as the stream reader does,
+    and adds their descriptors to the mocked ML worker.
+    """
+    batch_size, _, _, ml = mocked_ml_inference
+    source_id, video_path = video_source_to_read
+    cap = cv2.VideoCapture(video_path)
+    rings = []
+
+    def feed(num_frames: int):
+        for i in range(num_frames):
+            success, frame = cap.read()
+            if len(rings) == 0:
+                rings.append(FrameRingBuffer.create(source_id=source_id,
+                                                    plane_shapes={'model': (128, 128, 3), 'preview': frame.shape},
+                                                    num_slots=2 * batch_size))
+            tile = cv2.cvtColor(cv2.resize(frame, (128, 128)), cv2.COLOR_BGR2RGB)
+            ml.add((source_id, rings[0].write(source_id=source_id, planes={'model': tile, 'preview': frame},
+                                              timestamp=time.time()), success))
+
+    yield feed
+
+    cap.release()
+    for ring in rings:
+        ring.close()
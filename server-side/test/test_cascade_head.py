@@ -0,0 +1,23 @@
+import numpy as np
+
+from app.src.ml import CascadeHead
+
+
+class TestCascadeHead:
+    def test_predict_on_pooled_features(self):
+        head = CascadeHead(weights=np.array([1.0, -1.0]), bias=0.0)
+        windows = np.array([[[2.0, 0.0], [0.0, 0.0]],
+                            [[0.0, 0.0], [0.0, 0.0]],
+                            [[0.0, 4.0], [0.0, 0.0]]], dtype=np.float32)
+        probabilities = head.predict(windows)
+        assert probabilities.shape == (3,)
+        assert probabilities[0] > 0.5
+        assert np.isclose(probabilities[1], 0.5)
+        assert probabilities[2] < 0.5
+
+    def test_load(self, tmp_path):
+        path = str(tmp_path / 'head.npz')
+        np.savez(path, weights=np.ones(4), bias=np.array(-1.0))
+        head = CascadeHead.load(path)
+        assert head.weights.dtype == np.float32
+        assert head.bias == -1.0
@@ -0,0 +1,21 @@
+import time
+
+from app.src.ml.dynamic_batcher import DynamicBatcher
+
+
+class TestDynamicBatcher:
+    def test_batch_released_when_full(self):
+        batcher = DynamicBatcher(max_batch_size=2, max_wait=10.0)
+        batcher.mark_ready(1)
+        assert batcher.next_batch() == []
+        batcher.mark_ready(2)
+        assert batcher.next_batch() == [1, 2]
+        assert batcher.time_left() is None
+
+    def test_batch_released_after_deadline(self):
+        batcher = DynamicBatcher(max_batch_size=8, max_wait=0.05)
+        batcher.mark_ready(1)
+        assert batcher.next_batch() == []
+        time.sleep(0.06)
+        assert batcher.time_left() == 0.0
+        assert batcher.next_batch() == [1]
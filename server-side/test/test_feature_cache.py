@@ -0,0 +1,26 @@
+import numpy as np
+
+from app.src.ml.feature_cache import FeatureCache
+
+
+class TestFeatureCache:
+    def test_window_before_full(self):
+        cache = FeatureCache(window_size=4, feature_dim=2)
+        cache.append(np.array([[0, 0], [1, 1]], dtype=np.float32))
+        assert cache.size == 2
+        assert np.array_equal(cache.window()[:, 0], [0, 1])
+        assert np.array_equal(cache.last(), [1, 1])
+
+    def test_window_slides_in_order(self):
+        cache = FeatureCache(window_size=4, feature_dim=1)
+        for i in range(7):
+            cache.append(np.array([[i]], dtype=np.float32))
+        window = cache.window()
+        assert np.array_equal(window[:, 0], [3, 4, 5, 6])
+        # Contiguous view, no copy
+        assert window.flags['C_CONTIGUOUS'] and window.base is not None
+
+    def test_append_more_than_window(self):
+        cache = FeatureCache(window_size=3, feature_dim=1)
+        cache.append(np.arange(5, dtype=np.float32)[:, np.newaxis])
+        assert np.array_equal(cache.window()[:, 0], [2, 3, 4])
@@ -0,0 +1,77 @@
+import queue
+import time
+
+from app.src.stream import WorkerStreamReader
+from app.src.stream.frame_outbox import FrameOutbox
+from app.src.utilities import SharedCounters
+
+
+class Consumer:
+    """
+    Rejects the first num_full frames, like a full ML worker queue.
+    """
+
+    def __init__(self, num_full: int = 0) -> None:
+        self.taken = []
+        self.num_full = num_full
+
+    def __call__(self, data) -> None:
+        if self.num_full > 0:
+            self.num_full -= 1
+            raise queue.Full
+        self.taken.append(data)
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestFrameOutbox:
+    def test_sources_forwarded_in_turns(self):
+        consumer = Consumer()
+        outbox = FrameOutbox(on_done=consumer, counters=SharedCounters(WorkerStreamReader.COUNTERS))
+        # A fast source has published many frames, a slow one only two
+        for i in range(6):
+            outbox.put((1, i, True), limit=64)
+        outbox.put((2, 0, True), limit=64)
+        outbox.put((2, 1, True), limit=64)
+        outbox.start()
+
+        assert wait_for(lambda: len(consumer.taken) == 8)
+        outbox.stop()
+        # The slow source does not wait for the whole backlog of the fast one
+        assert consumer.taken[:4] == [(1, 0, True), (2, 0, True), (1, 1, True), (2, 1, True)]
+        assert consumer.taken[4:] == [(1, i, True) for i in range(2, 6)]
+
+    def test_oldest_dropped_over_limit(self):
+        consumer = Consumer()
+        counters = SharedCounters(WorkerStreamReader.COUNTERS)
+        outbox = FrameOutbox(on_done=consumer, counters=counters)
+        for i in range(5):
+            outbox.put((1, i, True), limit=2)
+        outbox.put((1, None, False), limit=2)
+        outbox.start()
+
+        assert wait_for(lambda: len(consumer.taken) == 3)
+        outbox.stop()
+        # End of stream markers are never dropped
+        assert consumer.taken == [(1, 3, True), (1, 4, True), (1, None, False)]
+        assert counters.snapshot()['reader.dropped_oldest'] == 3
+
+    def test_rejected_frames_retried(self):
+        consumer = Consumer(num_full=5)
+        counters = SharedCounters(WorkerStreamReader.COUNTERS)
+        outbox = FrameOutbox(on_done=consumer, counters=counters)
+        outbox.start()
+        for i in range(3):
+            outbox.put((1, i, True), limit=64)
+
+        assert wait_for(lambda: len(consumer.taken) == 3)
+        outbox.stop()
+        assert consumer.taken == [(1, i, True) for i in range(3)]
+        assert counters.snapshot()['reader.dropped_oldest'] == 0
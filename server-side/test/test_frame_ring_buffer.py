@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+
+from app.src.stream import FrameRingBuffer
+
+
+class TestFrameRingBuffer:
+    def test_write_read(self):
+        ring = FrameRingBuffer.create(source_id=1, plane_shapes={'model': (2, 2, 3), 'preview': (4, 4, 3)},
+                                      num_slots=4)
+        tile = np.full((2, 2, 3), 3, dtype=np.uint8)
+        frame = np.full((4, 4, 3), 7, dtype=np.uint8)
+        descriptor = ring.write(source_id=1, planes={'model': tile, 'preview': frame}, timestamp=time.time())
+
+        consumer = FrameRingBuffer.attach(descriptor)
+        planes = consumer.read(descriptor)
+        assert planes is not None
+        assert np.array_equal(planes['model'], tile)
+        assert np.array_equal(planes['preview'], frame)
+        assert ring.pending() == 0
+
+        consumer.close()
+        ring.close()
+
+    def test_oldest_slot_overwritten(self):
+        num_slots = 4
+        ring = FrameRingBuffer.create(source_id=1, plane_shapes={'preview': (4, 4, 3)}, num_slots=num_slots)
+        descriptors = [ring.write(source_id=1, planes={'preview': np.full((4, 4, 3), i, dtype=np.uint8)},
+                                  timestamp=time.time())
+                       for i in range(num_slots + 1)]
+
+        consumer = FrameRingBuffer.attach(descriptors[0])
+        assert consumer.read(descriptors[0]) is None
+        assert consumer.read(descriptors[-1])['preview'][0, 0, 0] == num_slots
+
+        consumer.close()
+        ring.close()
+
+    def test_skip(self):
+        ring = FrameRingBuffer.create(source_id=1, plane_shapes={'preview': (4, 4, 3)}, num_slots=4)
+        descriptors = [ring.write(source_id=1, planes={'preview': np.full((4, 4, 3), i, dtype=np.uint8)},
+                                  timestamp=time.time())
+                       for i in range(3)]
+        assert ring.pending() == 3
+
+        consumer = FrameRingBuffer.attach(descriptors[0])
+        consumer.skip(descriptors[0])
+        assert ring.pending() == 2
+        assert consumer.read(descriptors[1])['preview'][0, 0, 0] == 1
+        assert ring.pending() == 1
+
+        consumer.close()
+        ring.close()
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from app.src.stream.frame_scheduler import FrameScheduler
+
+
+class TestFrameScheduler:
+    def test_released_in_deadline_order(self):
+        scheduler = FrameScheduler()
+        scheduler.start()
+        released = []
+        lock = threading.Lock()
+        now = time.monotonic()
+        events = []
+        # Scheduled out of order, also with equal deadlines
+        for name, delay in [('c', 0.15), ('a', 0.05), ('b', 0.1), ('b2', 0.1)]:
+            release = threading.Event()
+            events.append(release)
+
+            def wait(release=release, name=name):
+                release.wait()
+                with lock:
+                    released.append((name, time.monotonic()))
+
+            threading.Thread(target=wait, daemon=True).start()
+            scheduler.schedule(deadline=now + delay, release=release)
+
+        assert all(release.wait(timeout=2) for release in events)
+        time.sleep(0.05)
+        order = [name for name, _ in sorted(released, key=lambda item: item[1])]
+        assert order[0] == 'a'
+        assert set(order[1:3]) == {'b', 'b2'}
+        assert order[3] == 'c'
+        scheduler.stop()
+
+    def test_not_released_before_deadline(self):
+        scheduler = FrameScheduler()
+        scheduler.start()
+        release = threading.Event()
+        deadline = time.monotonic() + 0.1
+        scheduler.schedule(deadline=deadline, release=release)
+
+        assert release.wait(timeout=2)
+        assert time.monotonic() >= deadline
+        scheduler.stop()
+
+    def test_cancel(self):
+        scheduler = FrameScheduler()
+        scheduler.start()
+        cancelled, other = threading.Event(), threading.Event()
+        now = time.monotonic()
+        scheduler.schedule(deadline=now + 0.05, release=cancelled)
+        scheduler.schedule(deadline=now + 0.1, release=other)
+        scheduler.cancel(cancelled)
+
+        assert other.wait(timeout=2)
+        assert not cancelled.is_set()
+        scheduler.stop()
+
+    def test_stop_releases_pending(self):
+        scheduler = FrameScheduler()
+        scheduler.start()
+        pending = [threading.Event() for _ in range(3)]
+        for i, release in enumerate(pending):
+            scheduler.schedule(deadline=time.monotonic() + 60 + i, release=release)
+
+        scheduler.stop()
+
+        assert all(release.is_set() for release in pending)
+        # Waiters scheduled after stopping are not left waiting either
+        late = threading.Event()
+        scheduler.schedule(deadline=time.monotonic() + 60, release=late)
+        assert late.is_set()
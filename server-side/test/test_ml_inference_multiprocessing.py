@@ -1,41 +1,33 @@
 import queue
 import time
 
-import cv2
-
 
 class TestMLInference:
-    def test_input_output_single_batch(self, mocked_ml_inference, video_source_to_read):
+    def test_input_output_single_batch(self, mocked_ml_inference, video_source_to_read, ml_frame_feeder):
         batch_size, input_q, output_q, ml = mocked_ml_inference
         source_id, video_path = video_source_to_read
+        # Frames are only encoded for sources with viewers
+        ml.update_source(source_id, viewers=1)
 
-        cap = cv2.VideoCapture(video_path)
-        for i in range(batch_size):
-            success, frame = cap.read()
-            ml.add((source_id, frame, success))
+        ml_frame_feeder(batch_size)
 
         time.sleep(1)
 
         for i in range(batch_size):
             try:
-                s_id, frame, enc_frame, scores, success = output_q.get(timeout=1, block=True)
+                s_id, frame, enc_frame, scores, timestamp, success = output_q.get(timeout=1, block=True)
                 assert s_id == source_id
                 assert frame.size > 0
                 assert len(enc_frame) > 0
-                assert len(scores) == 2
+                assert len(scores['CAR_CRASH']) == 2
                 assert success is True
             except queue.Empty:
                 assert 1 == 0, 'Output queue is empty!'
-        cap.release()
 
-    def test_input_output_not_full_batch(self, mocked_ml_inference, video_source_to_read):
+    def test_input_output_not_full_batch(self, mocked_ml_inference, ml_frame_feeder):
         batch_size, input_q, output_q, ml = mocked_ml_inference
-        source_id, video_path = video_source_to_read
 
-        cap = cv2.VideoCapture(video_path)
-        for i in range(batch_size-1):
-            success, frame = cap.read()
-            ml.add((source_id, frame, success))
+        ml_frame_feeder(batch_size - 1)
 
         time.sleep(1)
 
@@ -45,4 +37,18 @@ class TestMLInference:
         except queue.Empty:
             pass
 
-        cap.release()
\ No newline at end of file
+    def test_frames_not_encoded_without_viewers(self, mocked_ml_inference, ml_frame_feeder):
+        batch_size, input_q, output_q, ml = mocked_ml_inference
+
+        ml_frame_feeder(batch_size)
+
+        time.sleep(1)
+
+        for i in range(batch_size):
+            try:
+                s_id, frame, enc_frame, scores, timestamp, success = output_q.get(timeout=1, block=True)
+                assert frame.size > 0
+                assert enc_frame is None
+                assert success is True
+            except queue.Empty:
+                assert 1 == 0, 'Output queue is empty!'
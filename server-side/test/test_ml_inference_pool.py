@@ -0,0 +1,37 @@
+import pytest
+
+from app.src.ml import WorkerMLInferencePool
+
+
+class TestMLInferencePool:
+    def test_sources_placed_on_least_loaded_worker(self):
+        pool = WorkerMLInferencePool(on_done=lambda data: None, num_workers=2)
+        pool.add((1, None, True))
+        pool.add((2, None, True))
+        pool.add((1, None, True))
+        assert pool.get_worker_index(1) != pool.get_worker_index(2)
+
+        # Placement is released with the end of stream marker
+        worker_index = pool.get_worker_index(1)
+        pool.add((1, None, False))
+        assert pool.get_worker_index(1) is None
+        pool.add((3, None, True))
+        assert pool.get_worker_index(3) == worker_index
+
+    def test_primary_head_cannot_be_configured(self):
+        with pytest.raises(ValueError):
+            WorkerMLInferencePool(on_done=lambda data: None, heads={'CAR_CRASH': 'car_crash_head.onnx'})
+
+    def test_other_workers_forget_ended_source(self):
+        pool = WorkerMLInferencePool(on_done=lambda data: None, num_workers=2)
+        removed = {i: [] for i in range(len(pool.workers))}
+        for i, worker in enumerate(pool.workers):
+            worker.remove_source = removed[i].append
+        pool.add((1, None, True))
+        worker_index = pool.get_worker_index(1)
+        assert removed == {0: [], 1: []}
+
+        pool.add((1, None, False))
+        # The source's own worker forgets its parameters with the end of stream marker
+        assert removed[worker_index] == []
+        assert removed[1 - worker_index] == [1]
@@ -0,0 +1,26 @@
+import numpy as np
+
+from app.src.ml.motion_gate import MotionGate
+
+
+class TestMotionGate:
+    def test_static_clip(self):
+        gate = MotionGate(threshold=2.0)
+        tiles = np.full((30, 128, 128, 3), 100, dtype=np.uint8)
+        tiles[::2] += 1
+        assert gate.is_static(tiles) is True
+        assert gate.frozen is False
+
+    def test_moving_clip(self):
+        gate = MotionGate(threshold=2.0)
+        tiles = np.zeros((30, 128, 128, 3), dtype=np.uint8)
+        for i in range(30):
+            tiles[i, :, i * 4:(i + 1) * 4] = 255
+        assert gate.is_static(tiles) is False
+
+    def test_frozen_clip(self):
+        gate = MotionGate(threshold=None)
+        tiles = np.full((30, 128, 128, 3), 100, dtype=np.uint8)
+        assert gate.is_static(tiles) is False
+        assert gate.frozen is True
+        assert gate.num_duplicates == 29
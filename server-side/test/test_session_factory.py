@@ -0,0 +1,86 @@
+import pytest
+
+from app.src.ml import session_factory
+from app.src.ml.session_factory import SessionConfig, create_session, get_cached_model_path, get_providers
+
+
+class FakeSession:
+    def __init__(self, providers):
+        self.providers = list(providers)
+
+    def get_providers(self):
+        return self.providers
+
+
+@pytest.fixture()
+def cpu_only(monkeypatch):
+    monkeypatch.setattr(session_factory.ort, 'get_available_providers', lambda: ['CPUExecutionProvider'])
+
+
+@pytest.fixture()
+def cuda_available(monkeypatch):
+    monkeypatch.setattr(session_factory.ort, 'get_available_providers',
+                        lambda: ['CUDAExecutionProvider', 'CPUExecutionProvider'])
+
+
+@pytest.fixture()
+def model_path(tmp_path):
+    path = tmp_path / 'model.onnx'
+    path.write_bytes(b'model')
+    return str(path)
+
+
+class TestSessionFactory:
+    def test_unavailable_providers_skipped(self, cpu_only):
+        config = SessionConfig(providers=('CUDAExecutionProvider', 'CPUExecutionProvider'))
+        assert get_providers(config) == ('CPUExecutionProvider',)
+
+    def test_cpu_appended_as_fallback(self, cuda_available):
+        config = SessionConfig(providers=('CUDAExecutionProvider',))
+        assert get_providers(config) == ('CUDAExecutionProvider', 'CPUExecutionProvider')
+
+    def test_falls_back_to_cpu_if_session_fails(self, cuda_available, model_path, monkeypatch):
+        attempts = []
+
+        def create(model_path, config, providers, cache_dir):
+            attempts.append(providers)
+            if 'CUDAExecutionProvider' in providers:
+                raise RuntimeError('CUDA libraries could not be loaded')
+            return FakeSession(providers)
+
+        monkeypatch.setattr(session_factory, '_create_session', create)
+        session = create_session(model_path, SessionConfig(providers=('CUDAExecutionProvider',)))
+        assert attempts == [('CUDAExecutionProvider', 'CPUExecutionProvider'), ('CPUExecutionProvider',)]
+        assert session.get_providers() == ['CPUExecutionProvider']
+
+    def test_cpu_failure_raised(self, cpu_only, model_path, monkeypatch):
+        def create(model_path, config, providers, cache_dir):
+            raise RuntimeError('Invalid model')
+
+        monkeypatch.setattr(session_factory, '_create_session', create)
+        with pytest.raises(RuntimeError):
+            create_session(model_path, SessionConfig())
+
+    def test_cached_model_path(self, model_path, tmp_path):
+        config = SessionConfig()
+        cache_dir = str(tmp_path / 'cache')
+        path = get_cached_model_path(model_path, config, ('CPUExecutionProvider',), cache_dir)
+        assert path.startswith(cache_dir)
+        assert path.endswith('.onnx')
+        assert 'model_' in path
+        # Same inputs, same key
+        assert path == get_cached_model_path(model_path, config, ('CPUExecutionProvider',), cache_dir)
+        # Providers, optimization level and the model itself are part of the key
+        assert path != get_cached_model_path(model_path, config,
+                                             ('CUDAExecutionProvider', 'CPUExecutionProvider'), cache_dir)
+        assert path != get_cached_model_path(model_path, config._replace(graph_optimization_level='basic'),
+                                             ('CPUExecutionProvider',), cache_dir)
+        with open(model_path, 'wb') as f:
+            f.write(b'other model')
+        assert path != get_cached_model_path(model_path, config, ('CPUExecutionProvider',), cache_dir)
+
+    def test_cached_model_path_depends_on_onnxruntime_version(self, model_path, tmp_path, monkeypatch):
+        config = SessionConfig()
+        path = get_cached_model_path(model_path, config, ('CPUExecutionProvider',), str(tmp_path))
+        monkeypatch.setattr(session_factory.ort, '__version__', '0.0.0-test')
+        assert path != get_cached_model_path(model_path, config, ('CPUExecutionProvider',), str(tmp_path))
@@ -38,6 +38,16 @@ class TestSettingsController:
         response = test_client.put('/api/settings/threshold', data={'threshold': new_thr}, headers={'Authorization': 'Bearer ' + authenticated_user_data[1]})
         assert response.status_code == 404
 
+    def test_update_threshold_for_accident_type(self, db_session, test_client, threshold_data, authenticated_user_data):
+        db_session.add(threshold_data)
+        db_session.commit()
+        db_session.refresh(threshold_data)
+        new_thr = 0.6
+        response = test_client.put('/api/settings/threshold/FIRE', data={'threshold': new_thr}, headers={'Authorization': 'Bearer ' + authenticated_user_data[1]})
+        assert response.status_code == 200
+        assert response.json()['fire_threshold'] == new_thr
+        assert response.json()['car_crash_threshold'] == threshold_data.car_crash_threshold
+
     def test_get_recipients(self, db_session, test_client, recipients_data, authenticated_user_data):
         for r in recipients_data:
             db_session.add(r)
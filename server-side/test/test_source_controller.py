@@ -38,6 +38,32 @@ class TestSourceController:
                                     headers={'Authorization': 'Bearer ' + authenticated_user_data[1]})
         assert response.status_code == 400
 
+    def test_upload_source_video_with_inference_stride(self, db_session, test_client, authenticated_user_data):
+        video_file_name = 'test/static/video1.mp4'
+        with open(video_file_name, 'rb') as f:
+            response = test_client.post('/api/media', data={'title': 'VideoSource',
+                                                            'description': 'VideoSource description',
+                                                            'source_type': SourceType.VIDEO.value,
+                                                            'inference_stride': 3},
+                                        files={'video_file': (video_file_name, f, 'video/mp4')},
+                                        headers={'Authorization': 'Bearer ' + authenticated_user_data[1]})
+        assert response.status_code == 200
+        uploaded_source = db_session.query(Source).filter(Source.id == response.json()['id']).first()
+        assert uploaded_source.inference_stride == 3
+        assert uploaded_source.inference_fps is None
+        delete_file(uploaded_source.file_path)
+
+    def test_upload_source_video_when_inference_stride_invalid(self, db_session, test_client, authenticated_user_data):
+        video_file_name = 'test/static/video1.mp4'
+        with open(video_file_name, 'rb') as f:
+            response = test_client.post('/api/media', data={'title': 'VideoSource',
+                                                            'description': 'VideoSource description',
+                                                            'source_type': SourceType.VIDEO.value,
+                                                            'inference_stride': 0},
+                                        files={'video_file': (video_file_name, f, 'video/mp4')},
+                                        headers={'Authorization': 'Bearer ' + authenticated_user_data[1]})
+        assert response.status_code == 400
+
     def test_upload_source_stream(self, db_session, test_client, authenticated_user_data):
         stream_url = 'http://commondatastorage.googleapis.com/gtv-videos-bucket/sample/BigBuckBunny.mp4'
         response = test_client.post('/api/media', data={'title': 'StreamSource',
@@ -0,0 +1,83 @@
+import time
+
+from app.src.stream import FrameRingBuffer, WorkerStreamReader
+from app.src.utilities import SharedCounters
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestSourceDecoder:
+    def test_inference_stride(self, source_decoder_factory):
+        decoder, output, finished = source_decoder_factory(max_speed=True, inference_stride=3)
+        decoder.start()
+
+        assert wait_for(lambda: len(output) >= 9), 'Decoder did not publish enough frames!'
+        decoder.stop()
+
+        descriptors = [descriptor for _, descriptor, success in output[:9] if success]
+        assert len(descriptors) == 9
+        assert ['model' in descriptor.planes for descriptor in descriptors] == [i % 3 == 0 for i in range(9)]
+        assert all('preview' in descriptor.planes for descriptor in descriptors)
+
+    def test_frames_downscaled_for_preview_and_recording(self, source_decoder_factory):
+        decoder, output, finished = source_decoder_factory(max_speed=True, preview_max_width=64)
+        decoder.start()
+
+        assert wait_for(lambda: len(output) >= 1), 'Decoder did not publish a frame!'
+        _, descriptor, success = output[0]
+        ring = FrameRingBuffer.attach(descriptor)
+        planes = ring.read(descriptor)
+        ring.close()
+        decoder.stop()
+
+        # Only the preview leaves the reader, full resolution frames never reach the ML worker
+        assert set(planes) == {'model', 'preview'}
+        assert planes['preview'].shape[1] == 64
+
+    def test_drop_newest_over_quota(self, source_decoder_factory):
+        counters = SharedCounters(WorkerStreamReader.COUNTERS)
+        decoder, output, finished = source_decoder_factory(admission_policy='DROP_NEWEST', admission_quota=2,
+                                                           counters=counters)
+        decoder.start()
+
+        # Nothing reads the ring, so every frame after the first two is over the quota
+        assert wait_for(lambda: counters.snapshot()['reader.dropped_newest'] >= 3), 'No frames were dropped!'
+        decoder.stop()
+
+        assert len([descriptor for _, descriptor, success in output if success]) == 2
+
+    def test_degrade_over_quota(self, source_decoder_factory):
+        counters = SharedCounters(WorkerStreamReader.COUNTERS)
+        decoder, output, finished = source_decoder_factory(admission_policy='DEGRADE', admission_quota=2,
+                                                           counters=counters)
+        decoder.start()
+
+        assert wait_for(lambda: len(output) >= 5), 'Decoder did not publish enough frames!'
+        decoder.stop()
+
+        descriptors = [descriptor for _, descriptor, success in output[:5] if success]
+        assert ['model' in descriptor.planes for descriptor in descriptors] == [True, True, False, False, False]
+        assert all('preview' in descriptor.planes for descriptor in descriptors)
+        assert counters.snapshot()['reader.degraded'] >= 3
+
+    def test_max_speed_exempt_from_admission(self, source_decoder_factory):
+        counters = SharedCounters(WorkerStreamReader.COUNTERS)
+        decoder, output, finished = source_decoder_factory(max_speed=True, admission_policy='DROP_NEWEST',
+                                                           admission_quota=2, counters=counters)
+        decoder.start()
+
+        assert wait_for(lambda: len(output) >= 10), 'Decoder did not publish enough frames!'
+        decoder.stop()
+
+        descriptors = [descriptor for _, descriptor, success in output[:10] if success]
+        assert len(descriptors) == 10
+        assert all('model' in descriptor.planes for descriptor in descriptors)
+        assert counters.snapshot() == {'reader.dropped_newest': 0, 'reader.degraded': 0,
+                                       'reader.dropped_oldest': 0}
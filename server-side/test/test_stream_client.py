@@ -0,0 +1,34 @@
+from app.src.models.enums import StreamProtocol
+from app.src.services.source_stream_state import StreamClient
+from app.src.utilities import SharedCounters
+
+
+def drain(client: StreamClient):
+    messages = []
+    while not client.messages.empty():
+        messages.append(client.messages.get_nowait())
+    return messages
+
+
+class TestStreamClient:
+    def test_slow_client_gets_latest_frames(self):
+        counters = SharedCounters(('service.dropped_slow_client',))
+        client = StreamClient(websocket=None, protocol=StreamProtocol.JSON, max_messages=2, counters=counters)
+        # Nothing is sent meanwhile, i.e. the client is slow
+        for i in range(5):
+            client.put_latest((b'frame', {'seq': i}))
+
+        assert [message[1]['seq'] for message in drain(client)] == [3, 4]
+        assert counters.snapshot()['service.dropped_slow_client'] == 3
+
+    def test_end_of_stream_never_dropped(self):
+        counters = SharedCounters(('service.dropped_slow_client',))
+        client = StreamClient(websocket=None, protocol=StreamProtocol.BINARY, max_messages=2, counters=counters)
+        for i in range(2):
+            client.put_latest((b'frame',))
+        # As broadcast at the end of a stream
+        end_message = ({'source_id': 1, 'detail': 'Stream ended!'},)
+        client.put_latest(end_message)
+        client.put_latest(None)
+
+        assert drain(client) == [end_message, None]
@@ -0,0 +1,21 @@
+import numpy as np
+
+from app.src.services.stream_message import pack_frame_message, unpack_frame_message, FRAME_HEADER
+
+
+class TestStreamMessage:
+    def test_pack_unpack(self):
+        scores = {'CAR_CRASH': np.array([0.9, 0.1]), 'FIRE': np.array([0.2, 0.8])}
+        enc_frame = b'\xff\xd8jpeg\xff\xd9'
+        message = pack_frame_message(source_id=7, seq=42, timestamp=1700000000.25, scores=scores,
+                                     enc_frame=enc_frame)
+        assert len(message) == FRAME_HEADER.size + 2 + 4 * 4 + len(enc_frame)
+
+        unpacked = unpack_frame_message(message)
+        assert unpacked.source_id == 7
+        assert unpacked.seq == 42
+        assert unpacked.timestamp == 1700000000.25
+        assert list(unpacked.scores) == ['CAR_CRASH', 'FIRE']
+        assert np.allclose(unpacked.scores['CAR_CRASH'], [0.9, 0.1])
+        assert np.allclose(unpacked.scores['FIRE'], [0.2, 0.8])
+        assert unpacked.enc_frame == enc_frame
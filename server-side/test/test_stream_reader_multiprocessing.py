@@ -1,6 +1,8 @@
 import queue
 import time
 
+from app.src.stream import FrameRingBuffer
+
 
 class TestStreamReader:
 
@@ -8,30 +10,28 @@ class TestStreamReader:
         q, stream_reader = mocked_stream_reader
         source_id, source_str = video_source_to_read
 
-        with stream_reader.sources_lock:
-            assert len(stream_reader.sources) == 0
+        assert stream_reader.num_sources() == 0
 
         stream_reader.add_source(source_id, source_str)
+        time.sleep(0.5)
 
-        with stream_reader.sources_lock:
-            assert len(stream_reader.sources) == 1
+        assert stream_reader.num_sources() == 1
 
     def test_remove_source(self, mocked_stream_reader, video_source_to_read):
         q, stream_reader = mocked_stream_reader
         source_id, source_str = video_source_to_read
 
-        with stream_reader.sources_lock:
-            assert len(stream_reader.sources) == 0
+        assert stream_reader.num_sources() == 0
 
         stream_reader.add_source(source_id, source_str)
+        time.sleep(0.5)
 
-        with stream_reader.sources_lock:
-            assert len(stream_reader.sources) == 1
+        assert stream_reader.num_sources() == 1
 
         stream_reader.remove_source(source_id)
+        time.sleep(0.5)
 
-        with stream_reader.sources_lock:
-            assert len(stream_reader.sources) == 0
+        assert stream_reader.num_sources() == 0
 
     def test_output_queue_filled(self, mocked_stream_reader, video_source_to_read):
         q, stream_reader = mocked_stream_reader
@@ -44,19 +44,23 @@ class TestStreamReader:
         except queue.Empty:
             assert 1 == 0, "No data put in queue!"
 
-        s_id, frame, success = data
+        s_id, descriptor, success = data
         assert s_id == source_id
-        assert frame.size > 0
         assert success is True
+        ring = FrameRingBuffer.attach(descriptor)
+        planes = ring.read(descriptor)
+        ring.close()
+        assert planes is not None
+        assert planes['model'].shape == (128, 128, 3)
+        assert planes['preview'].size > 0
 
     def test_after_reading_done(self, mocked_stream_reader, video_source_to_read):
         q, stream_reader = mocked_stream_reader
         source_id, source_str = video_source_to_read
         stream_reader.add_source(source_id, source_str)
+        time.sleep(0.5)
 
-        with stream_reader.sources_lock:
-            assert len(stream_reader.sources) == 1
+        assert stream_reader.num_sources() == 1
 
         time.sleep(20)
-        with stream_reader.sources_lock:
-            assert len(stream_reader.sources) == 0
\ No newline at end of file
+        assert stream_reader.num_sources() == 0
\ No newline at end of file